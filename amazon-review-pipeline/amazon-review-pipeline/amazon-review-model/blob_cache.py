@@ -0,0 +1,98 @@
+"""
+Small cache for blobs that are looked up by filename, used to retrieve the review scores of the previous day.
+"""
+
+import time
+import threading
+
+
+class BlobCache:
+
+    def __init__(self, api, project_name, ttl=3600, max_entries=8, clock=time.monotonic):
+        """
+        :param ubiops.CoreApi api: long-lived API client, anything with `blobs_list` and `blobs_get` works
+        :param str project_name: name of the project the blobs are stored in
+        :param float ttl: number of seconds after which cached blob ids and contents are considered stale
+        :param int max_entries: maximum number of blob contents kept in memory
+        :param callable clock: function returning the current time in seconds
+        """
+
+        self.api = api
+        self.project_name = project_name
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+
+        # filename -> (blob id, expiry time), filled from a single listing of all blobs
+        self._ids = {}
+        # filename -> (blob id, loaded content, expiry time)
+        self._entries = {}
+        self._lock = threading.Lock()
+
+    def get(self, filename, load):
+        """
+        Return the content of the most recent blob with the given filename, or None if there is no such blob
+
+        :param str filename: filename of the blob
+        :param callable load: function that turns the downloaded blob (a file-like response) into the cached content
+        """
+
+        with self._lock:
+            now = self.clock()
+            entry = self._entries.get(filename)
+
+            if entry is not None and entry[2] > now:
+                return entry[1]
+
+            blob_id = self._blob_id(filename, now)
+            if blob_id is None:
+                return None
+
+            # The cached content is still valid if the filename still points to the same blob
+            if entry is not None and entry[0] == blob_id:
+                content = entry[1]
+            else:
+                response = self.api.blobs_get(project_name=self.project_name, blob_id=str(blob_id))
+                content = load(response)
+
+            self._entries[filename] = (blob_id, content, now + self.ttl)
+            self._evict(now)
+            return content
+
+    def invalidate(self, filename=None):
+        """
+        Forget a single filename, or everything if no filename is given
+        """
+
+        with self._lock:
+            if filename is None:
+                self._ids.clear()
+                self._entries.clear()
+            else:
+                self._ids.pop(filename, None)
+                self._entries.pop(filename, None)
+
+    def _blob_id(self, filename, now):
+        cached = self._ids.get(filename)
+        if cached is not None and cached[1] > now:
+            return cached[0]
+
+        # List all blobs once and remember the ids of all filenames, the last blob in the listing wins
+        expires = now + self.ttl
+        ids = {}
+        for blob in self.api.blobs_list(project_name=self.project_name):
+            ids[blob.filename] = blob.id
+
+        self._ids = {name: (blob_id, expires) for name, blob_id in ids.items()}
+        # Also remember that a filename doesn't exist, so it isn't listed again until it expires
+        self._ids.setdefault(filename, (None, expires))
+        return self._ids[filename][0]
+
+    def _evict(self, now):
+        expired = [name for name, entry in self._entries.items() if entry[2] <= now]
+        for name in expired:
+            del self._entries[name]
+
+        while len(self._entries) > self.max_entries:
+            oldest = min(self._entries, key=lambda name: self._entries[name][2])
+            del self._entries[oldest]
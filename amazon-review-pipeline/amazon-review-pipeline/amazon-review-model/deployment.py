@@ -5,10 +5,15 @@ class and 'request' method.
 
 import logging
 import os
+from datetime import date, timedelta
 import pandas as pd
 import joblib
 import ubiops
 
+from blob_cache import BlobCache
+from featurization import ParallelFeaturizer
+from score_store import ScoreStore
+from setup_logging import setup_logging
 
 logger = logging.getLogger('Amazon review model')
 
@@ -32,10 +37,34 @@ class Deployment:
                     You can also access those as normal environment variables via os.environ
         """
 
+        # Text or JSON lines, written directly or by a background thread, see setup_logging.py
+        setup_logging()
         logger.info("Initialising model")
         self.model = joblib.load('amazon_review_model.pkl')
         self.count_vectorizer = joblib.load('count_vectorizer.pkl')
 
+        # Large days can be featurized in parallel by setting FEATURIZATION_WORKERS to the number of processes
+        self.featurizer = ParallelFeaturizer(
+            vectorizer=self.count_vectorizer,
+            vectorizer_path='count_vectorizer.pkl',
+            workers=int(os.environ.get('FEATURIZATION_WORKERS', 1))
+        )
+
+        # Keep a single API client for all requests, and cache yesterday's review scores so every request doesn't
+        # have to list all blobs and download the scores again
+        self.api = self._connect_api(api_token=os.environ['API_TOKEN'])
+        self.review_scores_cache = BlobCache(
+            api=self.api,
+            project_name=os.environ['PROJECT_NAME'],
+            ttl=float(os.environ.get('REVIEW_SCORES_CACHE_TTL', 3600))
+        )
+
+        # The review scores of every day are also kept in a local indexed store, with a rolling retention period
+        self.score_store = ScoreStore(
+            path=os.environ.get('SCORE_STORE_PATH', os.path.join(base_directory, 'review_scores.db')),
+            retention_days=int(os.environ.get('SCORE_RETENTION_DAYS', 14))
+        )
+
     @staticmethod
     def _connect_api(api_token):
         client = ubiops.ApiClient(
@@ -55,8 +84,12 @@ class Deployment:
             with plain output, it is a string. In this example, a dictionary with the key: output.
         """
 
-        # Load the data of the day into a dataframe
-        df = pd.read_json(data)
+        # Load the data of the day into a dataframe, either from an Arrow IPC file (structured input with a blob
+        # field 'reviews') or from a JSON string (plain input)
+        if isinstance(data, dict):
+            df = pd.read_feather(data['reviews'])
+        else:
+            df = pd.read_json(data)
 
         # From the dataframe we can get the day
         day = df['day_of_week'].iloc[0]
@@ -75,27 +108,33 @@ class Deployment:
         # we will compare the predicted review score to a set threshold
         review_scores = self.retrieve_review_scores(yesterday=yesterday)
 
-        below_threshold = 0
-        products_below_threshold = []
-
         # Now we are ready to see if the review scores are stable
-        # For every product in the predictions, compare the average review score to the threshold score
-        for index, value in average_predictions.items():
-
-            if review_scores is not None:
-                review_threshold = review_scores.loc[review_scores['product_id'] == index, 'predictions'].iloc[0]
-            else:
-                # Load in the minimal threshold for the review
-                review_threshold = float(os.environ['THRESHOLD'])
-                
-            # Prompt a signal if the value drops significantly (0.2) below the threshold
-            if value < (review_threshold - 0.2):
-                below_threshold += 1
-                product_title = df.loc[df['product_id'] == index, 'product_name'].iloc[0]
-                products_below_threshold.append(product_title, )
-                logger.error(f"Product with id {index}, has not met its review standards")
-
-        # Output the review_scores to a csv, so it will be available for the next request.
+        # Join the average review score of every product with its threshold score
+        scores = average_predictions.rename('average').reset_index()
+
+        if review_scores is not None:
+            thresholds = review_scores[['product_id', 'predictions']].drop_duplicates('product_id')
+            scores = scores.merge(thresholds.rename(columns={'predictions': 'threshold'}), on='product_id', how='left')
+            # Products without a score from yesterday are compared to the minimal threshold, if it is set
+            scores['threshold'] = scores['threshold'].fillna(float(os.environ.get('THRESHOLD', 'nan')))
+        else:
+            # Load in the minimal threshold for the review
+            scores['threshold'] = float(os.environ['THRESHOLD'])
+
+        # Prompt a signal if the value drops significantly (0.2) below the threshold
+        below = scores[scores['average'] < (scores['threshold'] - 0.2)]
+        product_names = df[['product_id', 'product_name']].drop_duplicates('product_id')
+        below = below.merge(product_names, on='product_id', how='left')
+
+        for product_id in below['product_id']:
+            logger.error(f"Product with id {product_id}, has not met its review standards")
+
+        below_threshold = len(below)
+        products_below_threshold = below['product_name'].tolist()
+
+        # Store the review scores locally, and output them to a csv, so they will be available for the next request
+        # also when it is handled by another instance
+        self.score_store.put_day(day, average_predictions)
         average_predictions.to_csv(f"review_scores_{day.lower()}.csv", index=True)
 
         # Return the results
@@ -112,7 +151,7 @@ class Deployment:
         x_test = dataframe['review']
 
         # Because our X test data is text, it has to be transformed to vectors to be able to make predictions on
-        x_test_transformed = self.count_vectorizer.transform(x_test)
+        x_test_transformed = self.featurizer.transform(x_test)
 
         # Let's predict and paste the resulting array right onto the existing dataframe
         dataframe['predictions'] = self.model.predict(x_test_transformed)
@@ -122,17 +161,13 @@ class Deployment:
 
     def retrieve_review_scores(self, yesterday):
 
-        # Connect to APi to retrieve the review scores file from UbiOps
-        api = self._connect_api(api_token=os.environ['API_TOKEN'])
-
-        # If the review score of yesterday is there retrieve it from UbiOps
-        project_name = os.environ['PROJECT_NAME']
-        blobs_list = api.blobs_list(project_name=project_name)
-        review_scores = None
-
-        for blob in blobs_list:
-            if blob.filename == f"review_scores_{yesterday.lower()}.csv":
-                response = api.blobs_get(project_name=project_name, blob_id=str(blob.id))
-                review_scores = pd.read_csv(response)
+        # Look up the review scores of yesterday in the local store first, if this instance ran that day today or
+        # yesterday. An older run of the same day of the week (e.g. a week ago) may have been replaced by another
+        # instance since, so then the blob is used
+        review_scores = self.score_store.get_day(yesterday, since=date.today() - timedelta(days=1))
+        if review_scores is not None:
+            return review_scores
 
-        return review_scores
+        # Otherwise, if the review score of yesterday is there retrieve it from UbiOps, or from the cache if it was
+        # retrieved before and didn't change
+        return self.review_scores_cache.get(f"review_scores_{yesterday.lower()}.csv", load=pd.read_csv)
@@ -0,0 +1,63 @@
+"""
+Parallel text featurization. Large batches of reviews are split into shards, which are transformed by the count
+vectorizer in a pool of worker processes and stacked into a single CSR matrix, so the model can predict on all reviews
+at once.
+"""
+
+from concurrent.futures import ProcessPoolExecutor
+import joblib
+import numpy as np
+import scipy.sparse as sp
+
+
+# The vectorizer of a worker process, loaded once when the worker starts
+_worker_vectorizer = None
+
+
+def _init_worker(vectorizer_path):
+    global _worker_vectorizer
+    _worker_vectorizer = joblib.load(vectorizer_path)
+
+
+def _transform_shard(texts):
+    return _worker_vectorizer.transform(texts)
+
+
+class ParallelFeaturizer:
+
+    def __init__(self, vectorizer, vectorizer_path, workers=1, min_shard_size=10000):
+        """
+        :param sklearn.feature_extraction.text.CountVectorizer vectorizer: fitted vectorizer, used in-process for small
+            batches
+        :param str vectorizer_path: path to the pickled vectorizer, loaded once by every worker process
+        :param int workers: number of worker processes, 1 disables parallel featurization
+        :param int min_shard_size: minimum number of texts per shard, smaller batches are transformed in-process
+        """
+
+        self.vectorizer = vectorizer
+        self.vectorizer_path = vectorizer_path
+        self.workers = workers
+        self.min_shard_size = min_shard_size
+        self._pool = None
+
+    def transform(self, texts):
+        """
+        Transform the texts to a single CSR matrix, identical to `vectorizer.transform(texts)`
+        """
+
+        n_shards = min(self.workers, len(texts) // self.min_shard_size)
+        if n_shards <= 1:
+            return self.vectorizer.transform(texts)
+
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(
+                max_workers=self.workers, initializer=_init_worker, initargs=(self.vectorizer_path,)
+            )
+
+        shards = np.array_split(np.asarray(texts, dtype=object), n_shards)
+        return sp.vstack(list(self._pool.map(_transform_shard, [shard.tolist() for shard in shards])), format='csr')
+
+    def close(self):
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
@@ -0,0 +1,96 @@
+"""
+Local store for the average review scores per product per day, backed by SQLite. Scores are indexed by product and by
+day, so comparing with yesterday or looking at the trend of a product doesn't require parsing whole CSV files.
+
+The store only holds the scores written by this instance of the deployment. When several instances run, or a day was
+run again elsewhere, the review scores blob may be newer than the local copy.
+"""
+
+import sqlite3
+import threading
+from datetime import date, timedelta
+import pandas as pd
+
+
+class ScoreStore:
+
+    def __init__(self, path, retention_days=14):
+        """
+        :param str path: path to the SQLite database file, created if it doesn't exist
+        :param int retention_days: scores of runs older than this number of days are removed
+        """
+
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        # Stores created before the day was part of the primary key can hold only one day per run date, they are
+        # rebuilt as the scores are filled again by the next runs
+        primary_key = [row[1] for row in self._conn.execute('PRAGMA table_info(review_scores)') if row[5]]
+        if primary_key and 'day' not in primary_key:
+            self._conn.execute('DROP TABLE review_scores')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS review_scores ('
+            'product_id TEXT NOT NULL, run_date TEXT NOT NULL, day TEXT NOT NULL, score REAL NOT NULL, '
+            'PRIMARY KEY (product_id, day, run_date)) WITHOUT ROWID'
+        )
+        self._conn.execute('CREATE INDEX IF NOT EXISTS review_scores_day ON review_scores (day, run_date)')
+        self._conn.commit()
+
+    def put_day(self, day, scores, run_date=None):
+        """
+        Store the average review scores of a day and remove scores older than the retention period
+
+        :param str day: day of the week the reviews were collected for, e.g. 'Monday'
+        :param pandas.Series scores: average review score, indexed by product_id
+        :param datetime.date run_date: date of the run, defaults to today
+        """
+
+        run_date = run_date or date.today()
+        cutoff = (run_date - timedelta(days=self.retention_days)).isoformat()
+        rows = zip(scores.index.astype(str), [run_date.isoformat()] * len(scores), [day] * len(scores),
+                   scores.astype(float))
+
+        with self._lock, self._conn:
+            self._conn.executemany('INSERT OR REPLACE INTO review_scores VALUES (?, ?, ?, ?)', rows)
+            self._conn.execute('DELETE FROM review_scores WHERE run_date < ?', (cutoff,))
+
+    def get_day(self, day, since=None):
+        """
+        Return the scores of the most recent run for the given day of the week, in the same format as the review
+        scores CSV (columns product_id and predictions), or None if there are no scores for that day.
+
+        Only runs of this instance are stored, so a run from a week ago may be older than the blob another instance
+        wrote since. Pass `since` to ignore runs before that date.
+
+        :param str day: day of the week the reviews were collected for, e.g. 'Monday'
+        :param datetime.date since: only return scores of runs on or after this date
+        """
+
+        since = since.isoformat() if since else ''
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT product_id, score FROM review_scores WHERE day = ? AND run_date = '
+                '(SELECT MAX(run_date) FROM review_scores WHERE day = ? AND run_date >= ?)', (day, day, since)
+            ).fetchall()
+
+        if not rows:
+            return None
+        return pd.DataFrame(rows, columns=['product_id', 'predictions'])
+
+    def history(self, product_id):
+        """
+        Return all stored scores of a single product, ordered by run date
+        """
+
+        with self._lock:
+            rows = self._conn.execute(
+                'SELECT run_date, day, score FROM review_scores WHERE product_id = ? ORDER BY run_date',
+                (str(product_id),)
+            ).fetchall()
+
+        return pd.DataFrame(rows, columns=['run_date', 'day', 'predictions'])
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
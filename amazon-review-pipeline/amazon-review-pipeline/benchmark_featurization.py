@@ -0,0 +1,72 @@
+"""
+Benchmark the featurization and prediction of the amazon-review-model on a synthetic day of reviews.
+
+Usage:
+    python benchmark_featurization.py --reviews 1000000 --workers 1 2 4 8
+"""
+
+import os
+import sys
+import time
+import argparse
+import joblib
+import numpy as np
+
+MODEL_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'amazon-review-model')
+sys.path.append(MODEL_DIR)
+
+from featurization import ParallelFeaturizer  # noqa: E402
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="Benchmark featurization of a synthetic day of reviews",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--reviews', type=int, default=1000000, help="number of synthetic reviews")
+    parser.add_argument('--words', type=int, default=40, help="average number of words per review")
+    parser.add_argument('--workers', type=int, nargs='+', default=[1, 2, 4], help="numbers of worker processes")
+    parser.add_argument('--vectorizer', type=str, default=os.path.join(MODEL_DIR, 'count_vectorizer.pkl'),
+                        help="path to the pickled count vectorizer")
+    parser.add_argument('--model', type=str, default=os.path.join(MODEL_DIR, 'amazon_review_model.pkl'),
+                        help="path to the pickled model, the prediction is skipped if it doesn't exist")
+    parser.add_argument('--seed', type=int, default=42, help="random seed")
+    return parser.parse_args()
+
+
+def synthetic_reviews(vocabulary, n_reviews, n_words, rng):
+    words = np.asarray(sorted(vocabulary), dtype=object)
+    lengths = rng.poisson(n_words, size=n_reviews) + 1
+    tokens = words[rng.integers(0, len(words), size=lengths.sum())]
+    offsets = np.concatenate([[0], np.cumsum(lengths)])
+    return [' '.join(tokens[offsets[i]:offsets[i + 1]]) for i in range(n_reviews)]
+
+
+def main():
+    args = get_args()
+    vectorizer = joblib.load(args.vectorizer)
+    model = joblib.load(args.model) if os.path.exists(args.model) else None
+
+    print(f"Generating {args.reviews} synthetic reviews")
+    reviews = synthetic_reviews(vectorizer.vocabulary_, args.reviews, args.words, np.random.default_rng(args.seed))
+
+    print(f"{'workers':>8} {'featurize (s)':>14} {'reviews/s':>12} {'predict (s)':>12}")
+    for workers in args.workers:
+        featurizer = ParallelFeaturizer(vectorizer, args.vectorizer, workers=workers)
+        # Start the worker processes outside of the measurement
+        featurizer.transform(reviews[:featurizer.min_shard_size * workers])
+
+        start = time.perf_counter()
+        features = featurizer.transform(reviews)
+        featurize_time = time.perf_counter() - start
+
+        predict_time = float('nan')
+        if model is not None:
+            start = time.perf_counter()
+            model.predict(features)
+            predict_time = time.perf_counter() - start
+
+        featurizer.close()
+        print(f"{workers:>8} {featurize_time:>14.2f} {len(reviews) / featurize_time:>12.0f} {predict_time:>12.2f}")
+
+
+if __name__ == '__main__':
+    main()
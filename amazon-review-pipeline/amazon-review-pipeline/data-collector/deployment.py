@@ -8,11 +8,34 @@ import os
 from datetime import datetime
 import pandas as pd
 
+from setup_logging import setup_logging
+
 logger = logging.getLogger('Data collector')
 
 
-def return_days(n):
-    return datetime.strptime(n, '%Y-%m-%d %H:%M:%S').strftime('%A')
+WEEKDAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+
+# The columns the review model needs, sent to the model in the columnar (Arrow) output mode
+MODEL_COLUMNS = ['product_id', 'product_name', 'review', 'day_of_week']
+
+
+def return_days(times):
+    return pd.to_datetime(times, format='%Y-%m-%d %H:%M:%S').dt.day_name()
+
+
+def partition_reviews(reviews_path, partition_dir):
+    """
+    Split the reviews into one Parquet file per weekday, so a request only has to load the reviews of its own day
+    """
+
+    reviews = pd.read_csv(reviews_path)
+
+    # Reformat the time of review into day_of_week so we can partition
+    reviews['day_of_week'] = return_days(reviews['time_of_review'])
+
+    os.makedirs(partition_dir, exist_ok=True)
+    for day in WEEKDAYS:
+        reviews[reviews['day_of_week'] == day].to_parquet(os.path.join(partition_dir, f"{day.lower()}.parquet"))
 
 
 class InvalidDateError(Exception):
@@ -38,8 +61,19 @@ class Deployment:
                     You can also access those as normal environment variables via os.environ
         """
 
+        # Text or JSON lines, written directly or by a background thread, see setup_logging.py
+        setup_logging()
         logger.info("Initialising Data collector")
 
+        reviews_path = os.path.join(base_directory, 'reviews.csv')
+        self.partition_dir = os.path.join(base_directory, 'reviews_by_day')
+
+        # Partition the reviews by day once, unless it was already done for the current reviews file
+        marker = os.path.join(self.partition_dir, f"{WEEKDAYS[-1].lower()}.parquet")
+        if not os.path.exists(marker) or os.path.getmtime(marker) < os.path.getmtime(reviews_path):
+            logger.info("Partitioning reviews by day")
+            partition_reviews(reviews_path, self.partition_dir)
+
     def request(self, data):
         """
         Method for deployment requests, called separately for each individual request.
@@ -56,18 +90,26 @@ class Deployment:
         day = os.environ.get('DAY', datetime.today().strftime('%A')).title()
 
         # Raise an error if the day is invalid (there's no data for saturday/sunday)
-        if day not in ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']:
+        if day not in WEEKDAYS:
             raise InvalidDateError(f"No reviews found for day {day}")
 
-        # Read in the reviews as a dataframe
-        reviews = pd.read_csv('reviews.csv')
+        # Only collect data from `day` by reading in its partition of the reviews
+        logger.info(f"Collecting data from {day}")
+        partition_path = os.path.join(self.partition_dir, f"{day.lower()}.parquet")
 
-        # Reformat the time of review into day_of_week so we can filter
-        reviews['day_of_week'] = reviews['time_of_review'].apply(return_days)
+        # With OUTPUT_FORMAT=arrow, the needed columns are sent to the model as an Arrow IPC file in a blob,
+        # this requires a structured output field 'reviews' of type blob
+        if os.environ.get('OUTPUT_FORMAT', 'json').lower() == 'arrow':
+            day_reviews = pd.read_parquet(partition_path, columns=MODEL_COLUMNS)
 
-        # Only collect data from `day`
-        logger.info(f"Collecting data from {day}")
-        day_reviews = reviews[reviews['day_of_week'] == day]
+            logger.info(f"Data retrieved successfully, sending data to model")
+            day_reviews.reset_index(drop=True).to_feather('day_reviews.arrow')
+
+            return {
+                'reviews': 'day_reviews.arrow'
+            }
+
+        day_reviews = pd.read_parquet(partition_path)
 
         logger.info(f"Data retrieved successfully, sending data to model")
         df_string = day_reviews.to_json()
@@ -0,0 +1,121 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'amazon-review-model'))
+
+from blob_cache import BlobCache
+
+
+class FakeBlob:
+
+    def __init__(self, blob_id, filename):
+        self.id = blob_id
+        self.filename = filename
+
+
+class FakeBlobsApi:
+    """
+    In-memory stand-in for the blobs endpoints of ubiops.CoreApi that counts the calls
+    """
+
+    def __init__(self):
+        self.blobs = []
+        self.contents = {}
+        self.lists = 0
+        self.downloads = 0
+
+    def add(self, filename, content):
+        blob_id = len(self.blobs) + 1
+        self.blobs.append(FakeBlob(blob_id, filename))
+        self.contents[blob_id] = content
+
+    def blobs_list(self, project_name):
+        self.lists += 1
+        return list(self.blobs)
+
+    def blobs_get(self, project_name, blob_id):
+        self.downloads += 1
+        return self.contents[int(blob_id)]
+
+
+class Clock:
+
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def load(response):
+    return response
+
+
+def test_unchanged_blob_is_not_downloaded_again():
+    api, clock = FakeBlobsApi(), Clock()
+    api.add('review_scores_monday.csv', 'monday')
+    cache = BlobCache(api, 'project', ttl=60, clock=clock)
+
+    assert cache.get('review_scores_monday.csv', load) == 'monday'
+    assert cache.get('review_scores_monday.csv', load) == 'monday'
+    assert (api.lists, api.downloads) == (1, 1)
+
+    # After the time to live the blobs are listed again, but the content is kept as the blob id didn't change
+    clock.now = 61
+    assert cache.get('review_scores_monday.csv', load) == 'monday'
+    assert (api.lists, api.downloads) == (2, 1)
+
+
+def test_changed_blob_is_downloaded_again():
+    api, clock = FakeBlobsApi(), Clock()
+    api.add('review_scores_monday.csv', 'old')
+    cache = BlobCache(api, 'project', ttl=60, clock=clock)
+    assert cache.get('review_scores_monday.csv', load) == 'old'
+
+    api.add('review_scores_monday.csv', 'new')
+    clock.now = 61
+    assert cache.get('review_scores_monday.csv', load) == 'new'
+    assert api.downloads == 2
+
+
+def test_missing_blob_is_not_listed_again_until_it_expires():
+    api, clock = FakeBlobsApi(), Clock()
+    cache = BlobCache(api, 'project', ttl=60, clock=clock)
+
+    assert cache.get('review_scores_sunday.csv', load) is None
+    assert cache.get('review_scores_sunday.csv', load) is None
+    assert api.lists == 1
+
+    api.add('review_scores_sunday.csv', 'sunday')
+    clock.now = 61
+    assert cache.get('review_scores_sunday.csv', load) == 'sunday'
+
+
+def test_oldest_entry_is_evicted():
+    api, clock = FakeBlobsApi(), Clock()
+    for day in ('monday', 'tuesday', 'wednesday'):
+        api.add(f'review_scores_{day}.csv', day)
+    cache = BlobCache(api, 'project', ttl=60, max_entries=2, clock=clock)
+
+    for day in ('monday', 'tuesday', 'wednesday'):
+        clock.now += 1
+        cache.get(f'review_scores_{day}.csv', load)
+    assert api.downloads == 3
+    assert sorted(cache._entries) == ['review_scores_tuesday.csv', 'review_scores_wednesday.csv']
+
+    # The evicted blob is downloaded again, the others are still cached
+    cache.get('review_scores_wednesday.csv', load)
+    assert api.downloads == 3
+    cache.get('review_scores_monday.csv', load)
+    assert api.downloads == 4
+
+
+def test_invalidate_forgets_the_blob():
+    api, clock = FakeBlobsApi(), Clock()
+    api.add('review_scores_monday.csv', 'old')
+    cache = BlobCache(api, 'project', ttl=60, clock=clock)
+    cache.get('review_scores_monday.csv', load)
+
+    api.add('review_scores_monday.csv', 'new')
+    cache.invalidate('review_scores_monday.csv')
+    assert cache.get('review_scores_monday.csv', load) == 'new'
@@ -0,0 +1,50 @@
+import os
+import sys
+from datetime import date, timedelta
+
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'amazon-review-model'))
+
+pytest.importorskip('joblib')
+pytest.importorskip('ubiops')
+pytest.importorskip('sklearn')
+
+from deployment import Deployment  # noqa: E402
+from score_store import ScoreStore  # noqa: E402
+
+
+class FakeCache:
+
+    def __init__(self, content):
+        self.content = content
+        self.requested = []
+
+    def get(self, filename, load):
+        self.requested.append(filename)
+        return self.content
+
+
+def make_deployment(tmp_path, blob_scores):
+    deployment = Deployment.__new__(Deployment)
+    deployment.score_store = ScoreStore(str(tmp_path / 'review_scores.db'))
+    deployment.review_scores_cache = FakeCache(blob_scores)
+    return deployment
+
+
+def test_old_local_run_of_the_same_day_uses_the_blob(tmp_path):
+    blob_scores = pd.DataFrame({'product_id': ['a'], 'predictions': [2.0]})
+    deployment = make_deployment(tmp_path, blob_scores)
+    deployment.score_store.put_day('Monday', pd.Series([4.0], index=['a']), run_date=date.today() - timedelta(days=7))
+
+    assert deployment.retrieve_review_scores('Monday') is blob_scores
+    assert deployment.review_scores_cache.requested == ['review_scores_monday.csv']
+
+
+def test_recent_local_run_is_used(tmp_path):
+    deployment = make_deployment(tmp_path, None)
+    deployment.score_store.put_day('Monday', pd.Series([4.0], index=['a']), run_date=date.today() - timedelta(days=1))
+
+    assert deployment.retrieve_review_scores('Monday')['predictions'].tolist() == [4.0]
+    assert deployment.review_scores_cache.requested == []
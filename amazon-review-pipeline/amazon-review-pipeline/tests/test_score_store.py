@@ -0,0 +1,36 @@
+import os
+import sys
+from datetime import date
+
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'amazon-review-model'))
+
+from score_store import ScoreStore
+
+
+def test_days_on_the_same_run_date(tmp_path):
+    store = ScoreStore(str(tmp_path / 'review_scores.db'))
+    run_date = date(2022, 5, 2)
+    store.put_day('Monday', pd.Series([4.0, 3.5], index=['a', 'b']), run_date=run_date)
+    store.put_day('Tuesday', pd.Series([2.0, 1.5], index=['a', 'c']), run_date=run_date)
+
+    monday = store.get_day('Monday').set_index('product_id')['predictions'].to_dict()
+    tuesday = store.get_day('Tuesday').set_index('product_id')['predictions'].to_dict()
+    assert monday == {'a': 4.0, 'b': 3.5}
+    assert tuesday == {'a': 2.0, 'c': 1.5}
+    assert len(store.history('a')) == 2
+    store.close()
+
+
+def test_old_run_of_the_same_day_is_ignored(tmp_path):
+    store = ScoreStore(str(tmp_path / 'review_scores.db'))
+    store.put_day('Monday', pd.Series([4.0], index=['a']), run_date=date(2022, 5, 2))
+
+    assert store.get_day('Monday', since=date(2022, 5, 8)) is None
+    assert store.get_day('Monday', since=date(2022, 5, 2)) is not None
+
+    store.put_day('Monday', pd.Series([3.0], index=['a']), run_date=date(2022, 5, 9))
+    monday = store.get_day('Monday', since=date(2022, 5, 8))
+    assert monday['predictions'].tolist() == [3.0]
+    store.close()
@@ -1,4 +1,7 @@
+import os
 import json
+import time
+import threading
 import ubiops
 
 import azure.functions as func
@@ -6,6 +9,112 @@ import azure.functions as func
 
 PROJECT_NAME = '<YOUR PROJECT NAME>'
 PIPELINE_NAME = 'example-pipeline'
+TOKEN = '<YOUR TOKEN HERE>'
+
+# Rows are split into requests of at most this number of bytes of serialized input
+CHUNK_MAX_BYTES = int(os.environ.get('CHUNK_MAX_BYTES', 1000000))
+# Maximum number of seconds to wait for the results of a chunked request, HTTP triggered functions time out at 230
+RESULT_TIMEOUT = float(os.environ.get('RESULT_TIMEOUT', 200))
+# Maximum number of requests per batch request and per batch retrieval of the UbiOps API
+BATCH_LIMIT = 100
+# Maximum number of connections kept alive to the UbiOps API per worker
+POOL_SIZE = int(os.environ.get('UBIOPS_POOL_SIZE', 4))
+
+_api = None
+_api_lock = threading.Lock()
+
+
+def get_api():
+    """
+    Return the UbiOps API client. It is created on the first invocation and reused by all warm invocations of the
+    worker, so the batch requests and result polling of every invocation share its pool of kept-alive connections.
+    """
+
+    global _api
+    with _api_lock:
+        if _api is None:
+            configuration = ubiops.Configuration()
+            configuration.api_key['Authorization'] = f"Token {TOKEN}"
+            configuration.connection_pool_maxsize = POOL_SIZE
+
+            client = ubiops.ApiClient(configuration)
+            _api = ubiops.api.CoreApi(client)
+    return _api
+
+
+def split_rows(rows, max_bytes):
+    """
+    Split the rows into chunks of which the serialized JSON is at most max_bytes, keeping their order. A single row
+    larger than max_bytes gets a chunk of its own.
+
+    :param list rows: rows of the Data Factory lookup
+    :param int max_bytes: maximum size of a chunk
+    :return list: (JSON array of the rows, number of rows) of every chunk
+    """
+
+    chunks = []
+    current = []
+    size = 2
+    for row in rows:
+        serialized = json.dumps(row)
+        # Every row after the first adds a separator of 2 bytes
+        row_size = len(serialized.encode('utf-8')) + (2 if current else 0)
+        if current and size + row_size > max_bytes:
+            chunks.append(current)
+            current = []
+            size = 2
+            row_size -= 2
+        current.append(serialized)
+        size += row_size
+    if current:
+        chunks.append(current)
+
+    return [(f"[{', '.join(chunk)}]", len(chunk)) for chunk in chunks]
+
+
+def request_chunks(api, chunks, timeout):
+    """
+    Send the chunks as batch pipeline requests, which UbiOps processes in parallel, and wait for all results
+
+    :param ubiops.CoreApi api: API client
+    :param list chunks: request inputs
+    :param float timeout: maximum number of seconds to wait for the results
+    :return list: the finished pipeline requests, in the order of the chunks
+    """
+
+    ids = []
+    for start in range(0, len(chunks), BATCH_LIMIT):
+        created = api.batch_pipeline_requests_create(
+            project_name=PROJECT_NAME,
+            pipeline_name=PIPELINE_NAME,
+            data=chunks[start:start + BATCH_LIMIT]
+        )
+        ids.extend(request.id for request in created)
+
+    # Batch retrieval doesn't keep the order of the ids, the results are put back in place by id
+    position = {request_id: i for i, request_id in enumerate(ids)}
+    results = [None] * len(ids)
+    pending = list(ids)
+    deadline = time.monotonic() + timeout
+    delay = 0.5
+    while pending:
+        time.sleep(delay)
+        delay = min(delay * 2, 5)
+
+        for start in range(0, len(pending), BATCH_LIMIT):
+            for request in api.pipeline_requests_batch_get(
+                project_name=PROJECT_NAME,
+                pipeline_name=PIPELINE_NAME,
+                data=pending[start:start + BATCH_LIMIT]
+            ):
+                if request.status in ('completed', 'failed', 'cancelled'):
+                    results[position[request.id]] = request
+        pending = [request_id for request_id in ids if results[position[request_id]] is None]
+
+        if pending and time.monotonic() > deadline:
+            raise TimeoutError(f"{len(pending)} of {len(ids)} pipeline requests did not finish in time: {pending}")
+
+    return results
 
 
 def main(req: func.HttpRequest):
@@ -18,15 +127,30 @@ def main(req: func.HttpRequest):
     # Get the POST request body
     req_body = req.get_json()
 
-    configuration = ubiops.Configuration()
-    configuration.api_key['Authorization'] = 'Token <YOUR TOKEN HERE>'
+    api = get_api()
 
-    client = ubiops.ApiClient(configuration)
-    api = ubiops.api.CoreApi(client)
-    r = api.pipeline_requests_create(
-        project_name=PROJECT_NAME,
-        pipeline_name=PIPELINE_NAME,
-        data={'data': json.dumps(req_body['value']), 'training': False}
+    chunks = split_rows(req_body['value'], CHUNK_MAX_BYTES)
+    if len(chunks) <= 1:
+        r = api.pipeline_requests_create(
+            project_name=PROJECT_NAME,
+            pipeline_name=PIPELINE_NAME,
+            data={'data': chunks[0][0] if chunks else '[]', 'training': False}
+        )
+        return json.dumps({'output': f"Response of pipeline request is {r}"})
+
+    results = request_chunks(
+        api, [{'data': chunk, 'training': False} for chunk, _ in chunks], timeout=RESULT_TIMEOUT
     )
 
-    return json.dumps({'output': f"Response of pipeline request is {r}"})
+    failed = [(i, r.status, r.error_message) for i, r in enumerate(results) if r.status != 'completed']
+    if failed:
+        raise RuntimeError(f"{len(failed)} of {len(results)} pipeline requests failed or were cancelled: {failed}")
+
+    # Every chunk is returned with the position of its first row, so its output can be matched with the input rows
+    output = []
+    first_row = 0
+    for (_, n_rows), r in zip(chunks, results):
+        output.append({'first_row': first_row, 'rows': n_rows, 'request_id': r.id, 'result': r.result})
+        first_row += n_rows
+
+    return json.dumps({'output': output})
@@ -0,0 +1,115 @@
+"""
+Compare the latency of deployment requests made with a new UbiOps client per invocation and with a single client that
+is reused by warm invocations, against a local mock of the UbiOps API.
+
+Usage:
+    python benchmark_client_reuse.py --requests 200 --delay 0.005
+"""
+
+import json
+import time
+import argparse
+import threading
+import statistics
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import ubiops
+
+
+PROJECT_NAME = 'benchmark-project'
+DEPLOYMENT_NAME = 'example-deployment'
+VERSION = 'v1'
+
+
+class MockApiHandler(BaseHTTPRequestHandler):
+    """
+    Answers every POST with a completed deployment request, keeping connections alive like the real API
+    """
+
+    protocol_version = 'HTTP/1.1'
+    # Headers and body are written separately, without this kept-alive connections wait for delayed ACKs
+    disable_nagle_algorithm = True
+    delay = 0.0
+    connections = 0
+
+    def setup(self):
+        super().setup()
+        MockApiHandler.connections += 1
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get('Content-Length', 0)))
+        time.sleep(self.delay)
+
+        body = json.dumps({
+            'id': '00000000-0000-0000-0000-000000000000',
+            'deployment': DEPLOYMENT_NAME,
+            'version': VERSION,
+            'status': 'completed',
+            'success': True,
+            'result': {'output': 1},
+            'error_message': None
+        }).encode()
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def new_api(host, pool_size=None):
+    configuration = ubiops.Configuration(host=host)
+    configuration.api_key['Authorization'] = "Token benchmark"
+    configuration.client_side_validation = False
+    if pool_size:
+        configuration.connection_pool_maxsize = pool_size
+    return ubiops.api.CoreApi(ubiops.ApiClient(configuration))
+
+
+def make_request(api):
+    return api.deployment_requests_create(
+        project_name=PROJECT_NAME,
+        deployment_name=DEPLOYMENT_NAME,
+        data={'input': 1}
+    )
+
+
+def measure(name, invoke, n_requests):
+    MockApiHandler.connections = 0
+    latencies = []
+    for _ in range(n_requests):
+        start = time.perf_counter()
+        invoke()
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    latencies.sort()
+    print(f"{name:<28} {statistics.mean(latencies):>10.2f} {latencies[len(latencies) // 2]:>10.2f} "
+          f"{latencies[int(len(latencies) * 0.99) - 1]:>10.2f} {MockApiHandler.connections:>12}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare a new UbiOps client per invocation with a reused client",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help="number of sequential invocations")
+    parser.add_argument('--delay', type=float, default=0.0, help="processing time of the mock API in seconds")
+    parser.add_argument('--pool_size', type=int, default=4, help="connection pool size of the reused client")
+    args = parser.parse_args()
+
+    MockApiHandler.delay = args.delay
+    server = ThreadingHTTPServer(('127.0.0.1', 0), MockApiHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host = f"http://127.0.0.1:{server.server_address[1]}/v2.1"
+
+    print(f"{'client':<28} {'mean (ms)':>10} {'p50 (ms)':>10} {'p99 (ms)':>10} {'connections':>12}")
+    measure("new client per invocation", lambda: make_request(new_api(host)), args.requests)
+
+    shared_api = new_api(host, pool_size=args.pool_size)
+    measure("reused client", lambda: make_request(shared_api), args.requests)
+
+    server.shutdown()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,3 +1,6 @@
+import os
+import threading
+
 import ubiops
 
 import azure.functions as func
@@ -8,6 +11,30 @@ DEPLOYMENT_NAME = 'example-deployment'
 VERSION = 'v1'
 TOKEN = '<YOUR TOKEN HERE>'
 
+# Maximum number of connections kept alive to the UbiOps API per worker
+POOL_SIZE = int(os.environ.get('UBIOPS_POOL_SIZE', 4))
+
+_api = None
+_api_lock = threading.Lock()
+
+
+def get_api():
+    """
+    Return the UbiOps API client. It is created on the first invocation and reused by all warm invocations of the
+    worker, so they share its pool of kept-alive connections.
+    """
+
+    global _api
+    with _api_lock:
+        if _api is None:
+            configuration = ubiops.Configuration()
+            configuration.api_key['Authorization'] = f"Token {TOKEN}"
+            configuration.connection_pool_maxsize = POOL_SIZE
+
+            client = ubiops.ApiClient(configuration)
+            _api = ubiops.api.CoreApi(client)
+    return _api
+
 
 def main(req: func.HttpRequest):
     """
@@ -19,11 +46,7 @@ def main(req: func.HttpRequest):
     # Get the POST request body
     req_body = req.get_json()
 
-    configuration = ubiops.Configuration()
-    configuration.api_key['Authorization'] = f"Token {TOKEN}"
-
-    client = ubiops.ApiClient(configuration)
-    api = ubiops.api.CoreApi(client)
+    api = get_api()
     r = api.batch_deployment_requests_create(
         project_name=PROJECT_NAME,
         deployment_name=DEPLOYMENT_NAME,
@@ -1,13 +1,130 @@
+import os
+import json
+import math
+import threading
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
 import ubiops
 
 import azure.functions as func
 
+from dispatcher import Dispatcher
+from polling import wait_for_request
+
 
 PROJECT_NAME = '<YOUR PROJECT NAME>'
 DEPLOYMENT_NAME = 'example-deployment'
 VERSION = 'v1'
 TOKEN = '<YOUR TOKEN HERE>'
 
+# Maximum number of connections kept alive to the UbiOps API per worker
+POOL_SIZE = int(os.environ.get('UBIOPS_POOL_SIZE', 4))
+# Maximum number of requests in flight when a list of inputs is posted
+FANOUT_CONCURRENCY = int(os.environ.get('FANOUT_CONCURRENCY', 50))
+# Maximum number of seconds a status call waits for a request to finish
+STATUS_MAX_WAIT = float(os.environ.get('STATUS_MAX_WAIT', 30))
+
+_api = None
+_api_lock = threading.Lock()
+
+
+def get_api():
+    """
+    Return the UbiOps API client. It is created on the first invocation and reused by all warm invocations of the
+    worker, so they share its pool of kept-alive connections.
+    """
+
+    global _api
+    with _api_lock:
+        if _api is None:
+            configuration = ubiops.Configuration()
+            configuration.api_key['Authorization'] = f"Token {TOKEN}"
+            configuration.connection_pool_maxsize = POOL_SIZE
+
+            client = ubiops.ApiClient(configuration)
+            _api = ubiops.api.CoreApi(client)
+    return _api
+
+
+def status_url(req, request_id):
+    """
+    URL of the status of a request: the URL of this function, including its function key, with the request id
+    """
+
+    url = urlsplit(req.url)
+    query = [(key, value) for key, value in parse_qsl(url.query) if key not in ('mode', 'request_id')]
+    query.append(('request_id', request_id))
+    return urlunsplit(url._replace(query=urlencode(query)))
+
+
+def submit(req, req_body):
+    """
+    Create deployment requests without waiting for them to finish, and return their ids and status URLs directly
+
+    :param req: HttpRequest object
+    :param dict/list req_body: input of a single request, or a list of inputs
+    """
+
+    inputs = req_body if isinstance(req_body, list) else [req_body]
+    created = get_api().batch_deployment_version_requests_create(
+        project_name=PROJECT_NAME,
+        deployment_name=DEPLOYMENT_NAME,
+        version=VERSION,
+        data=inputs
+    )
+
+    submitted = [
+        {'request_id': r.id, 'status': r.status, 'status_url': status_url(req, r.id)} for r in created
+    ]
+    if isinstance(req_body, list):
+        return func.HttpResponse(json.dumps(submitted), status_code=202, mimetype='application/json')
+    return func.HttpResponse(json.dumps(submitted[0]), status_code=202, mimetype='application/json',
+                             headers={'Location': submitted[0]['status_url']})
+
+
+def status(req):
+    """
+    Return the status of a deployment request, and its result once it is finished. With the `wait` parameter, the call
+    waits up to that number of seconds for the request to finish.
+
+    :param req: HttpRequest object
+    """
+
+    request_id = req.params.get('request_id')
+    if not request_id:
+        return func.HttpResponse("Please pass the request_id of the request in the query string", status_code=400)
+    try:
+        wait = float(req.params.get('wait', 0))
+    except ValueError:
+        wait = None
+    if wait is None or not math.isfinite(wait):
+        return func.HttpResponse("The wait parameter should be a number of seconds", status_code=400)
+    wait = max(0.0, min(wait, STATUS_MAX_WAIT))
+
+    api = get_api()
+    request, retry_after = wait_for_request(
+        lambda: api.deployment_version_requests_get(
+            project_name=PROJECT_NAME,
+            deployment_name=DEPLOYMENT_NAME,
+            version=VERSION,
+            request_id=request_id
+        ),
+        wait=wait
+    )
+
+    body = json.dumps({
+        'request_id': request.id,
+        'status': request.status,
+        'success': request.success,
+        'result': request.result,
+        'error_message': request.error_message
+    })
+    if retry_after:
+        # Not finished yet, suggest when to poll again
+        return func.HttpResponse(body, status_code=202, mimetype='application/json',
+                                 headers={'Retry-After': str(max(round(retry_after), 1))})
+    return func.HttpResponse(body, status_code=200, mimetype='application/json')
+
 
 def main(req: func.HttpRequest):
     """
@@ -16,14 +133,22 @@ def main(req: func.HttpRequest):
     :param req: HttpRequest object
     """
 
+    if req.method == 'GET':
+        return status(req)
+
     # Get the POST request body
     req_body = req.get_json()
 
-    configuration = ubiops.Configuration()
-    configuration.api_key['Authorization'] = f"Token {TOKEN}"
+    if req.params.get('mode') == 'async':
+        return submit(req, req_body)
+
+    if isinstance(req_body, list):
+        # A request is made for every input in the list, sent concurrently
+        dispatcher = Dispatcher(TOKEN, PROJECT_NAME, concurrency=FANOUT_CONCURRENCY)
+        responses = dispatcher.run(dispatcher.deployment_path(DEPLOYMENT_NAME, VERSION), req_body)
+        return json.dumps(responses)
 
-    client = ubiops.ApiClient(configuration)
-    api = ubiops.api.CoreApi(client)
+    api = get_api()
     r = api.deployment_requests_create(
         project_name=PROJECT_NAME,
         deployment_name=DEPLOYMENT_NAME,
@@ -0,0 +1,45 @@
+"""
+Waits for a request to finish by polling it with exponential backoff, for the status endpoint of the functions.
+
+A status call with a `wait` time long-polls: the function keeps polling UbiOps until the request is finished or the wait
+time is up, so a client needs a single call for short model runs and few calls for long ones. Without a wait time the
+status is returned directly, together with a suggested delay before the next poll.
+"""
+
+import math
+import time
+
+
+FINISHED_STATUSES = ('completed', 'failed', 'cancelled')
+
+
+def wait_for_request(get, wait=0.0, initial_delay=0.25, max_delay=2.0, clock=time.monotonic, sleep=time.sleep):
+    """
+    Poll a request until it is finished or the wait time is up
+
+    :param callable get: function returning the request details, with a `status` attribute
+    :param float wait: maximum number of seconds to wait for the request to finish
+    :param float initial_delay: delay before the second poll in seconds, doubled for every next poll
+    :param float max_delay: maximum delay between polls in seconds
+    :param callable clock: function returning the current time in seconds
+    :param callable sleep: function sleeping for a number of seconds
+    :return tuple: the last request details, and the suggested delay in seconds before polling again
+    """
+
+    if not math.isfinite(wait):
+        # A NaN deadline is never reached
+        raise ValueError(f"The wait time should be a finite number of seconds, not {wait}")
+
+    deadline = clock() + max(wait, 0.0)
+    delay = initial_delay
+    while True:
+        request = get()
+        if request.status in FINISHED_STATUSES:
+            return request, 0
+
+        remaining = deadline - clock()
+        if remaining <= 0:
+            return request, delay
+
+        sleep(min(delay, remaining))
+        delay = min(delay * 2, max_delay)
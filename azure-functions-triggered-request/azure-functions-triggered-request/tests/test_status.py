@@ -0,0 +1,79 @@
+import os
+import sys
+import importlib.util
+
+import pytest
+
+func = pytest.importorskip('azure.functions')
+pytest.importorskip('ubiops')
+pytest.importorskip('aiohttp')
+
+FUNCTIONS = os.path.join(os.path.dirname(__file__), '..', 'functions')
+
+
+def load_function(name):
+    """
+    Import the function of a function app, with the polling and dispatcher modules of that app
+    """
+
+    app = os.path.join(FUNCTIONS, name)
+    sys.path.insert(0, app)
+    for module in ('polling', 'dispatcher'):
+        sys.modules.pop(module, None)
+    try:
+        spec = importlib.util.spec_from_file_location(name.replace('-', '_'), os.path.join(app, name, '__init__.py'))
+        function = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(function)
+        return function
+    finally:
+        sys.path.remove(app)
+
+
+class FakeRequest:
+
+    def __init__(self, status):
+        self.id = 'request-id'
+        self.status = status
+        self.success = status == 'completed'
+        self.result = None
+        self.error_message = None
+
+
+def status_request(**params):
+    return func.HttpRequest('GET', 'http://localhost/api/status', params=params, body=b'')
+
+
+@pytest.fixture(params=['deployment-request', 'pipeline-request'])
+def function(request):
+    return load_function(request.param)
+
+
+@pytest.mark.parametrize('wait', ['nan', '-inf', 'inf', 'soon'])
+def test_invalid_wait_is_rejected(function, wait):
+    response = function.main(status_request(request_id='request-id', wait=wait))
+    assert response.status_code == 400
+
+
+def test_missing_request_id_is_rejected(function):
+    assert function.main(status_request()).status_code == 400
+
+
+def test_negative_wait_returns_directly(function, monkeypatch):
+    class Api:
+        def __getattr__(self, name):
+            return lambda **kwargs: FakeRequest('processing')
+
+    monkeypatch.setattr(function, 'get_api', Api)
+    response = function.main(status_request(request_id='request-id', wait='-5'))
+    assert response.status_code == 202
+    assert 'Retry-After' in response.headers
+
+
+def test_polling_rejects_nan_and_stops_on_cancelled():
+    polling = load_function('deployment-request').wait_for_request
+    with pytest.raises(ValueError):
+        polling(lambda: FakeRequest('processing'), wait=float('nan'), sleep=lambda seconds: None)
+
+    request, retry_after = polling(lambda: FakeRequest('cancelled'), wait=10, sleep=lambda seconds: None)
+    assert request.status == 'cancelled'
+    assert retry_after == 0
@@ -0,0 +1,159 @@
+"""
+Benchmark the running total of the blob storage deployment against a local fake of the UbiOps blobs API.
+
+It compares the original request flow (list, download and upload a blob per request) with the BlobAccumulator state
+store, sends the requests from multiple threads and instances, and checks whether increments were lost.
+
+Usage:
+    python benchmark_state_store.py --requests 200 --threads 8 --latency 0.01
+"""
+
+import os
+import sys
+import time
+import pickle
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'deployment_blob_storage'))
+
+from state_store import BlobAccumulator  # noqa: E402
+
+
+class FakeBlob:
+
+    def __init__(self, blob_id):
+        self.id = blob_id
+
+    def to_dict(self):
+        return {'id': self.id}
+
+
+class FakeResponse:
+
+    def __init__(self, content):
+        self.content = content
+
+    def read(self):
+        return self.content
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeBlobsApi:
+    """
+    In-memory stand-in for the blobs endpoints of ubiops.CoreApi, with a fixed latency per call
+    """
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.blobs = {}
+        self.calls = 0
+        self._next_id = 0
+        self._lock = threading.Lock()
+
+    def _call(self):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.latency)
+
+    def blobs_list(self, project_name, range=None):
+        self._call()
+        with self._lock:
+            ids = sorted(self.blobs, reverse=True)
+        return [FakeBlob(blob_id) for blob_id in (ids[:abs(range)] if range else ids)]
+
+    def blobs_get(self, project_name, blob_id):
+        self._call()
+        return FakeResponse(self.blobs[blob_id])
+
+    def blobs_create(self, project_name, file, blob_ttl=None):
+        self._call()
+        with open(file, 'rb') as f:
+            content = f.read()
+        with self._lock:
+            self._next_id += 1
+            self.blobs[self._next_id] = content
+            return FakeBlob(self._next_id)
+
+    def latest_value(self):
+        state = pickle.loads(self.blobs[max(self.blobs)])
+        if isinstance(state, dict):
+            return sum(increments - decrements for increments, decrements in state.values())
+        return state
+
+
+def original_request(api, input_number, path):
+    # The request flow of the deployment before the state store
+    api_response = api.blobs_list('project', range=-1)
+    old_number = 0
+    if len(api_response) > 0:
+        with api.blobs_get('project', api_response[0].to_dict().get('id')) as response:
+            old_number = pickle.loads(response.read())
+    pickle.dump(old_number + input_number, open(path, 'wb'))
+    api.blobs_create('project', path, blob_ttl=86400)
+
+
+def run(name, request, api, n_requests, n_threads):
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=n_threads) as executor:
+        list(executor.map(request, range(n_requests)))
+    elapsed = time.perf_counter() - start
+    print(f"{name:<40} {n_requests / elapsed:>10.1f} {api.calls / n_requests:>10.2f} "
+          f"{api.latest_value():>10} {n_requests:>10}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the blob storage running total",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--requests', type=int, default=200, help="number of requests, each adding 1")
+    parser.add_argument('--threads', type=int, default=8, help="number of concurrent requests")
+    parser.add_argument('--latency', type=float, default=0.01, help="latency of every fake API call in seconds")
+    parser.add_argument('--flush_every', type=int, default=10, help="additions per write in the batched runs")
+    args = parser.parse_args()
+
+    print(f"{'mode':<40} {'req/s':>10} {'calls/req':>10} {'total':>10} {'expected':>10}")
+
+    api = FakeBlobsApi(args.latency)
+    paths = threading.local()
+
+    def original(_):
+        if not hasattr(paths, 'path'):
+            paths.path = f"new_number_{threading.get_ident()}.p"
+        original_request(api, 1, paths.path)
+
+    run("original", original, api, args.requests, args.threads)
+    for path in os.listdir('.'):
+        if path.startswith('new_number_'):
+            os.remove(path)
+
+    api = FakeBlobsApi(args.latency)
+    store = BlobAccumulator(api, 'project')
+    run("state store, write every request", lambda _: store.add(1), api, args.requests, args.threads)
+
+    api = FakeBlobsApi(args.latency)
+    store = BlobAccumulator(api, 'project', flush_every=args.flush_every)
+    run(f"state store, write every {args.flush_every} requests", lambda _: store.add(1), api, args.requests,
+        args.threads)
+    store.close()
+
+    # Two instances adding to the same total
+    api = FakeBlobsApi(args.latency)
+    stores = [BlobAccumulator(api, 'project', flush_every=args.flush_every, optimistic=True) for _ in range(2)]
+    run(f"2 instances, optimistic, every {args.flush_every}", lambda i: stores[i % 2].add(1), api, args.requests,
+        args.threads)
+    for store in stores:
+        store.close()
+    # Let every instance merge the latest state once more, as would happen on their next requests
+    for store in stores:
+        store.add(0)
+    print(f"{'2 instances, after final merge':<40} {'':>10} {'':>10} {api.latest_value():>10} {args.requests:>10}")
+
+
+if __name__ == '__main__':
+    main()
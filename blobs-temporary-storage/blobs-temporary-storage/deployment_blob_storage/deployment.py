@@ -4,8 +4,11 @@ class and 'request' method.
 """
 
 import os
+import functools
 import ubiops
-import pickle
+
+from state_backends import MemoryBackend, DiskBackend, BlobBackend
+from state_store import BlobAccumulator
 
 
 class Deployment:
@@ -42,6 +45,50 @@ class Deployment:
         # Create an instance of the API class
         self.api_instance = ubiops.CoreApi(api_client)
 
+        # Choose where the running total is kept with STATE_BACKEND:
+        # - 'accumulator' (default): in memory, written back to a blob so it is shared between instances. By default,
+        #   the total is written after every request. Set FLUSH_EVERY and/or FLUSH_INTERVAL (seconds) to write in
+        #   batches, and OPTIMISTIC_CONCURRENCY when multiple instances add to the same total.
+        # - 'blob': in a blob per key with the same get/put interface as the local backends, written every FLUSH_EVERY
+        #   requests. Use it for a single instance, multiple instances would overwrite each other's total.
+        # - 'memory': only in the memory of this instance, no network I/O at all
+        # - 'disk': in a local key-value file of this instance
+        blob_ttl = 86400  # one day
+        self.state_backend = os.environ.get('STATE_BACKEND', 'accumulator').lower()
+
+        if self.state_backend == 'memory':
+            self.state = MemoryBackend(ttl=blob_ttl)
+        elif self.state_backend == 'disk':
+            self.state = DiskBackend(
+                path=os.path.join(base_directory, 'state.db'),
+                ttl=blob_ttl,
+                batch_size=int(os.environ.get('FLUSH_EVERY', 1))
+            )
+        elif self.state_backend == 'blob':
+            self.state = BlobBackend(
+                api=self.api_instance,
+                project_name=os.environ['PROJECT_NAME'],
+                ttl=blob_ttl,
+                batch_size=int(os.environ.get('FLUSH_EVERY', 1))
+            )
+        else:
+            self.state = BlobAccumulator(
+                api=self.api_instance,
+                project_name=os.environ['PROJECT_NAME'],
+                filename="new_number.p",
+                blob_ttl=blob_ttl,
+                flush_every=int(os.environ.get('FLUSH_EVERY', 1)),
+                flush_interval=float(os.environ.get('FLUSH_INTERVAL', 0)),
+                optimistic=os.environ.get('OPTIMISTIC_CONCURRENCY', 'false').lower() == 'true'
+            )
+
+        if self.state_backend in ('memory', 'disk', 'blob'):
+            # The key-value backends keep the total under a key
+            self.add_to_total = functools.partial(self.state.add, 'total')
+        else:
+            # The accumulator holds a single total
+            self.add_to_total = self.state.add
+
         print("Initialising blob storage Deployment")
 
     def request(self, data):
@@ -59,33 +106,8 @@ class Deployment:
         # Get the input number
         input_number = data.get('input_number')
 
-        project_name = os.environ['PROJECT_NAME']
-        blob_ttl = 86400  # one day
-
-        # List latest blob
-        api_response = self.api_instance.blobs_list(project_name, range=-1)
-
-        # Default the old number to 0
-        old_number = 0
-        if len(api_response) > 0:
-            # Get the last blob id
-            blob_id = api_response[0].to_dict().get('id')
-
-            # Get the latest blob using its id
-            with self.api_instance.blobs_get(project_name, blob_id) as response:
-                content = response.read()
-                # We get the file as a bytestring so we can simply load it on the fly
-                old_number = pickle.loads(content)
-
-        # Add the number to the previous total
-        output_number = old_number + input_number
-
-        # Pickle the file to local storage
-        # (Pickle is a serialisation method) https://docs.python.org/3/library/pickle.html
-        pickle.dump(output_number, open("new_number.p", "wb"))
-
-        # Upload the pickle
-        self.api_instance.blobs_create(project_name, "new_number.p", blob_ttl=blob_ttl)
+        # Add the number to the previous total, as a single atomic update whichever backend is used
+        output_number = self.add_to_total(input_number)
 
         # Print and return the current total
         print(output_number)
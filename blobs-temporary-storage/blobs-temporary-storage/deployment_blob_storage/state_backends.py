@@ -0,0 +1,240 @@
+"""
+Key-value state backends for stateful deployments, all with the same `get`/`put`/`update`/`add` interface:
+
+- MemoryBackend: kept in the memory of the instance, lost when the instance stops
+- DiskBackend: kept in a local SQLite file, survives restarts of the deployment code within the same instance
+- BlobBackend: kept in UbiOps blobs, survives instance restarts and can be read by other instances
+
+Values expire after a time to live, matching the `blob_ttl` of the blobs API. Values are serialized with the highest
+pickle protocol and compressed when they are large. The disk and blob backends buffer writes and write them in
+batches; call `flush` (or `close`) to write pending values directly.
+
+`update` and `add` are atomic within an instance. When multiple instances add to the same value in blobs, use the
+`BlobAccumulator` of state_store.py instead, which merges their additions.
+"""
+
+import os
+import abc
+import time
+import zlib
+import pickle
+import sqlite3
+import tempfile
+import threading
+
+
+_RAW = b'\x00'
+_COMPRESSED = b'\x01'
+COMPRESS_THRESHOLD = 1024
+
+
+def dumps(value):
+    data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+    if len(data) >= COMPRESS_THRESHOLD:
+        return _COMPRESSED + zlib.compress(data)
+    return _RAW + data
+
+
+def loads(data):
+    if data[:1] == _COMPRESSED:
+        return pickle.loads(zlib.decompress(data[1:]))
+    return pickle.loads(data[1:])
+
+
+class StateBackend(abc.ABC):
+
+    def __init__(self, ttl=86400, batch_size=1, clock=time.time):
+        """
+        :param float ttl: default time to live of values in seconds, None to keep values forever
+        :param int batch_size: number of writes after which the pending values are written in a single batch
+        :param callable clock: function returning the current time in seconds
+        """
+
+        self.ttl = ttl
+        self.batch_size = batch_size
+        self.clock = clock
+        self._lock = threading.RLock()
+        # key -> (value, expiry time) of values that are not written yet
+        self._pending = {}
+        # Number of writes since the last batch, writes to the same key count separately
+        self._unflushed = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            now = self.clock()
+            if key in self._pending:
+                value, expires = self._pending[key]
+            else:
+                found = self._read(key)
+                if found is None:
+                    return default
+                value, expires = found
+
+            if expires is not None and expires <= now:
+                return default
+            return value
+
+    def put(self, key, value, ttl=None):
+        self.put_many({key: value}, ttl=ttl)
+
+    def update(self, key, function, default=None, ttl=None):
+        """
+        Replace the value of a key by `function(value)` and return the new value. Concurrent updates of the same
+        instance are applied one after another, so none of them is lost.
+
+        :param str key: key of the value
+        :param callable function: function returning the new value given the current one
+        :param default: current value to use if the key isn't stored or expired
+        :param float ttl: time to live of the new value in seconds, the default time to live of the backend if None
+        """
+
+        with self._lock:
+            value = function(self.get(key, default))
+            self.put(key, value, ttl=ttl)
+            return value
+
+    def add(self, key, number, ttl=None):
+        """
+        Add a number to the value of a key, which starts at 0, and return the new value
+        """
+
+        return self.update(key, lambda value: value + number, default=0, ttl=ttl)
+
+    def put_many(self, items, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        with self._lock:
+            expires = self.clock() + ttl if ttl is not None else None
+            for key, value in items.items():
+                self._pending[key] = (value, expires)
+            self._unflushed += len(items)
+
+            if self._unflushed >= self.batch_size:
+                self.flush()
+
+    def flush(self):
+        with self._lock:
+            if self._pending:
+                self._write_many(self._pending)
+                self._pending = {}
+            self._unflushed = 0
+
+    def close(self):
+        self.flush()
+
+    @abc.abstractmethod
+    def _read(self, key):
+        """
+        Return the stored (value, expiry time) of the key, or None if it isn't stored
+        """
+
+    @abc.abstractmethod
+    def _write_many(self, items):
+        """
+        Store a dictionary of key -> (value, expiry time)
+        """
+
+
+class MemoryBackend(StateBackend):
+
+    def __init__(self, ttl=86400, clock=time.time):
+        super().__init__(ttl=ttl, batch_size=1, clock=clock)
+        self._values = {}
+
+    def _read(self, key):
+        return self._values.get(key)
+
+    def _write_many(self, items):
+        now = self.clock()
+        self._values.update(items)
+        # Drop expired values, so memory doesn't grow with keys that are never read again
+        for key in [key for key, (_, expires) in self._values.items() if expires is not None and expires <= now]:
+            del self._values[key]
+
+
+class DiskBackend(StateBackend):
+
+    def __init__(self, path, ttl=86400, batch_size=1, clock=time.time):
+        """
+        :param str path: path to the SQLite database file, created if it doesn't exist
+        """
+
+        super().__init__(ttl=ttl, batch_size=batch_size, clock=clock)
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value BLOB NOT NULL, expires REAL) WITHOUT ROWID'
+        )
+        self._conn.commit()
+
+    def _read(self, key):
+        row = self._conn.execute('SELECT value, expires FROM state WHERE key = ?', (key,)).fetchone()
+        if row is None:
+            return None
+        return loads(row[0]), row[1]
+
+    def _write_many(self, items):
+        with self._conn:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO state VALUES (?, ?, ?)',
+                [(key, dumps(value), expires) for key, (value, expires) in items.items()]
+            )
+            self._conn.execute('DELETE FROM state WHERE expires <= ?', (self.clock(),))
+
+    def close(self):
+        super().close()
+        self._conn.close()
+
+
+class BlobBackend(StateBackend):
+
+    def __init__(self, api, project_name, prefix='state_', ttl=86400, batch_size=1, clock=time.time):
+        """
+        :param ubiops.CoreApi api: API client, anything with `blobs_list`, `blobs_get` and `blobs_create` works
+        :param str project_name: name of the project the blobs are stored in
+        :param str prefix: prefix of the blob filenames, the filename of a value is the prefix followed by its key
+        """
+
+        super().__init__(ttl=ttl, batch_size=batch_size, clock=clock)
+        self.api = api
+        self.project_name = project_name
+        self.prefix = prefix
+        # key -> (value, expiry time); values are read from blobs only once and kept up to date on writes
+        self._cache = {}
+        # key -> blob id, filled by a single listing of the blobs
+        self._blob_ids = None
+        self._tmp_dir = tempfile.mkdtemp()
+
+    def _read(self, key):
+        if key in self._cache:
+            return self._cache[key]
+
+        if self._blob_ids is None:
+            self._blob_ids = {}
+            # The listing is ordered from new to old, walk it backwards so the most recent blob of a filename wins
+            for blob in reversed(self.api.blobs_list(self.project_name)):
+                if blob.filename.startswith(self.prefix):
+                    self._blob_ids[blob.filename[len(self.prefix):]] = blob.id
+
+        blob_id = self._blob_ids.get(key)
+        if blob_id is None:
+            return None
+
+        with self.api.blobs_get(self.project_name, blob_id) as response:
+            self._cache[key] = loads(response.read())
+        return self._cache[key]
+
+    def _write_many(self, items):
+        now = self.clock()
+        for key, (value, expires) in items.items():
+            # The value and its expiry time are stored together, the blob itself expires at the same time
+            path = os.path.join(self._tmp_dir, f"{self.prefix}{key}")
+            with open(path, 'wb') as f:
+                f.write(dumps((value, expires)))
+
+            if expires is not None:
+                blob = self.api.blobs_create(self.project_name, path, blob_ttl=max(int(expires - now), 1))
+            else:
+                blob = self.api.blobs_create(self.project_name, path)
+            self._cache[key] = (value, expires)
+            if self._blob_ids is not None:
+                self._blob_ids[key] = blob.id
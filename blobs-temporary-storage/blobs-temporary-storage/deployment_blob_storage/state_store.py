@@ -0,0 +1,158 @@
+"""
+State store for a running total that is kept in UbiOps blobs.
+
+The total is kept in memory and written back to a blob in batches, so a request doesn't need to list, download and
+upload blobs. To make concurrent writers conflict-free, the state is stored as the sum of increments (and decrements)
+per writer. Merging two states takes the maximum per writer, so a state read from a blob written by another instance
+can always be merged without losing or double counting increments.
+"""
+
+import os
+import uuid
+import pickle
+import tempfile
+import threading
+
+
+class BlobAccumulator:
+
+    def __init__(self, api, project_name, filename='new_number.p', blob_ttl=86400, flush_every=1,
+                 flush_interval=None, optimistic=False, max_retries=3):
+        """
+        :param ubiops.CoreApi api: API client, anything with `blobs_list`, `blobs_get` and `blobs_create` works
+        :param str project_name: name of the project the blobs are stored in
+        :param str filename: filename of the state blobs
+        :param int blob_ttl: time to live of the state blobs in seconds
+        :param int flush_every: write the state to a blob after this number of additions
+        :param float flush_interval: if set, also write the state from a background thread every this number of seconds
+        :param bool optimistic: set when multiple instances share the state. Before and after every write, the latest
+            blob is checked; if it was written by another instance, it is merged and written again.
+        :param int max_retries: maximum number of extra writes in optimistic mode
+        """
+
+        self.api = api
+        self.project_name = project_name
+        self.filename = filename
+        self.blob_ttl = blob_ttl
+        self.flush_every = flush_every
+        self.optimistic = optimistic
+        self.max_retries = max_retries
+        self.writer_id = uuid.uuid4().hex[:8]
+
+        # Protects the counts, held only for in-memory updates
+        self._lock = threading.Lock()
+        # Serializes the writes to the blob storage
+        self._flush_lock = threading.Lock()
+        # writer id -> (sum of increments, sum of decrements)
+        self._counts = {}
+        self._unflushed = 0
+        self._tmp_dir = tempfile.mkdtemp()
+
+        # The state is listed only once, afterwards the id of the latest blob is tracked by the store itself
+        self.blob_id = self._latest_blob_id()
+        if self.blob_id is not None:
+            self._counts = self._download(self.blob_id)
+
+        self._stop = threading.Event()
+        self._flusher = None
+        if flush_interval:
+            self._flusher = threading.Thread(target=self._flush_periodically, args=(flush_interval,), daemon=True)
+            self._flusher.start()
+
+    @property
+    def value(self):
+        with self._lock:
+            return self._total(self._counts)
+
+    def add(self, number):
+        """
+        Add a number to the total and return the new total
+        """
+
+        with self._lock:
+            increments, decrements = self._counts.get(self.writer_id, (0, 0))
+            if number >= 0:
+                increments += number
+            else:
+                decrements -= number
+            self._counts[self.writer_id] = (increments, decrements)
+            self._unflushed += 1
+            total = self._total(self._counts)
+            should_flush = self._unflushed >= self.flush_every
+
+        if should_flush:
+            total = self.flush()
+        return total
+
+    def flush(self):
+        """
+        Write the state to a new blob if it changed since the last write, and return the total
+        """
+
+        with self._flush_lock:
+            with self._lock:
+                changed = self._unflushed > 0
+                self._unflushed = 0
+
+            if changed:
+                for _ in range(self.max_retries + 1):
+                    if self.optimistic:
+                        self._merge_latest()
+
+                    with self._lock:
+                        counts = dict(self._counts)
+                    self.blob_id = self._upload(counts)
+
+                    # Another instance may have written in between, in that case merge its state and write again
+                    if not self.optimistic or self._latest_blob_id() == self.blob_id:
+                        break
+
+            return self.value
+
+    def close(self):
+        self._stop.set()
+        if self._flusher is not None:
+            self._flusher.join()
+        self.flush()
+
+    @staticmethod
+    def _total(counts):
+        return sum(increments - decrements for increments, decrements in counts.values())
+
+    def _flush_periodically(self, interval):
+        while not self._stop.wait(interval):
+            self.flush()
+
+    def _merge_latest(self):
+        latest_id = self._latest_blob_id()
+        if latest_id is None or latest_id == self.blob_id:
+            return
+
+        remote = self._download(latest_id)
+        with self._lock:
+            for writer_id, (increments, decrements) in remote.items():
+                local_increments, local_decrements = self._counts.get(writer_id, (0, 0))
+                self._counts[writer_id] = (max(increments, local_increments), max(decrements, local_decrements))
+
+    def _latest_blob_id(self):
+        api_response = self.api.blobs_list(self.project_name, range=-1)
+        if len(api_response) == 0:
+            return None
+        return api_response[0].to_dict().get('id')
+
+    def _download(self, blob_id):
+        with self.api.blobs_get(self.project_name, blob_id) as response:
+            state = pickle.loads(response.read())
+
+        # Blobs written before the state store contain only the total
+        if not isinstance(state, dict):
+            return {'initial': (max(state, 0), max(-state, 0))}
+        return state
+
+    def _upload(self, counts):
+        path = os.path.join(self._tmp_dir, self.filename)
+        with open(path, 'wb') as f:
+            pickle.dump(counts, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+        blob = self.api.blobs_create(self.project_name, path, blob_ttl=self.blob_ttl)
+        return blob.id
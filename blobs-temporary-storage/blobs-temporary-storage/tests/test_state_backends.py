@@ -0,0 +1,77 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'deployment_blob_storage'))
+
+from state_backends import BlobBackend, DiskBackend, MemoryBackend
+
+
+class FakeBlob:
+
+    def __init__(self, blob_id, filename):
+        self.id = blob_id
+        self.filename = filename
+
+
+class FakeResponse:
+
+    def __init__(self, content):
+        self.content = content
+
+    def read(self):
+        return self.content
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+
+class FakeBlobsApi:
+
+    def __init__(self):
+        # blob id -> (filename, content, blob_ttl)
+        self.blobs = {}
+
+    def blobs_list(self, project_name):
+        return [FakeBlob(blob_id, self.blobs[blob_id][0]) for blob_id in sorted(self.blobs, reverse=True)]
+
+    def blobs_get(self, project_name, blob_id):
+        return FakeResponse(self.blobs[blob_id][1])
+
+    def blobs_create(self, project_name, file, blob_ttl=None):
+        with open(file, 'rb') as f:
+            blob_id = len(self.blobs) + 1
+            self.blobs[blob_id] = (os.path.basename(file), f.read(), blob_ttl)
+        return FakeBlob(blob_id, os.path.basename(file))
+
+
+def test_backends_are_interchangeable(tmp_path):
+    backends = [MemoryBackend(), DiskBackend(str(tmp_path / 'state.db')), BlobBackend(FakeBlobsApi(), 'project')]
+    for backend in backends:
+        assert backend.get('total', 0) == 0
+        assert backend.add('total', 2) == 2
+        assert backend.add('total', 3) == 5
+        backend.put('name', 'value')
+        assert backend.get('name') == 'value'
+        backend.close()
+
+
+def test_blob_backend_batches_writes_with_blob_ttl():
+    now = [1000.0]
+    api = FakeBlobsApi()
+    backend = BlobBackend(api, 'project', ttl=60, batch_size=3, clock=lambda: now[0])
+
+    backend.add('total', 1)
+    backend.add('total', 1)
+    assert api.blobs == {}
+    backend.add('total', 1)
+    assert len(api.blobs) == 1
+    assert api.blobs[1][0] == 'state_total'
+    assert api.blobs[1][2] == 60
+
+    # Another instance reads the value from the blob, until it expires
+    assert BlobBackend(api, 'project', clock=lambda: now[0]).get('total') == 3
+    now[0] += 61
+    assert BlobBackend(api, 'project', clock=lambda: now[0]).get('total') is None
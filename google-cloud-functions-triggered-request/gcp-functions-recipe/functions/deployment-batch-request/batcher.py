@@ -0,0 +1,121 @@
+"""
+Coalesces messages of multiple function invocations into batch requests.
+
+Messages are added to an open batch, which is sent as soon as it holds `max_size` messages or its first message waited
+`max_wait` seconds. By default an invocation waits until the batch holding its message is sent (and raises if sending
+failed), so Pub/Sub only acknowledges messages that actually reached UbiOps. Concurrent invocations on the same
+instance then share a single batch request.
+"""
+
+import time
+import threading
+
+
+class _Batch:
+
+    def __init__(self, created):
+        self.created = created
+        self.items = []
+        self.done = threading.Event()
+        self.error = None
+
+
+class Coalescer:
+
+    def __init__(self, send, max_size=100, max_wait=1.0, clock=time.monotonic):
+        """
+        :param callable send: function that sends a list of messages as a single batch request
+        :param int max_size: maximum number of messages in a batch request
+        :param float max_wait: maximum number of seconds a message waits for other messages, 0 sends every
+            invocation directly
+        :param callable clock: function returning the current time in seconds
+        """
+
+        self.send = send
+        self.max_size = max_size
+        self.max_wait = max_wait
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._batch = None
+
+    def add(self, items, wait=True):
+        """
+        Add messages to the open batch
+
+        :param list items: messages to send
+        :param bool wait: wait until the messages are sent. If False, the messages may stay in memory until a later
+            invocation sends the batch, and are lost if the instance is stopped before that.
+        """
+
+        if not self.max_wait:
+            for start in range(0, len(items), self.max_size):
+                self.send(items[start:start + self.max_size])
+            return
+
+        batches = []
+        to_send = []
+        with self._lock:
+            for item in items:
+                if self._batch is None:
+                    self._batch = _Batch(self.clock())
+                self._batch.items.append(item)
+                batches.append(self._batch)
+
+                if len(self._batch.items) >= self.max_size:
+                    to_send.append(self._take())
+
+            # A batch of which the first message waited long enough is sent by the next invocation
+            if self._batch is not None and self.clock() - self._batch.created >= self.max_wait:
+                to_send.append(self._take())
+
+        for batch in to_send:
+            self._send(batch)
+
+        if wait:
+            for batch in dict.fromkeys(batches):
+                self._wait(batch)
+        else:
+            for batch in to_send:
+                self._raise(batch)
+
+    def flush(self):
+        """
+        Send the open batch directly
+        """
+
+        with self._lock:
+            batch = self._take()
+        if batch is not None:
+            self._send(batch)
+            self._raise(batch)
+
+    def _wait(self, batch):
+        remaining = batch.created + self.max_wait - self.clock()
+        if not batch.done.wait(timeout=max(remaining, 0)):
+            # Not enough messages arrived in time, send the batch from this invocation
+            with self._lock:
+                owner = self._batch is batch
+                if owner:
+                    self._take()
+            if owner:
+                self._send(batch)
+            else:
+                batch.done.wait()
+        self._raise(batch)
+
+    def _take(self):
+        batch, self._batch = self._batch, None
+        return batch
+
+    def _send(self, batch):
+        try:
+            self.send(batch.items)
+        except Exception as e:
+            batch.error = e
+        finally:
+            batch.done.set()
+
+    @staticmethod
+    def _raise(batch):
+        if batch.error is not None:
+            raise batch.error
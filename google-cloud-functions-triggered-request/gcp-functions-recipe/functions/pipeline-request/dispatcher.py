@@ -0,0 +1,168 @@
+"""
+Sends many requests to UbiOps concurrently from a single function invocation, using asyncio instead of threads.
+
+Payloads are fanned out with a bounded number of requests in flight, failed requests are retried with exponential
+backoff, and results are returned in the order of the payloads. From a synchronous function, use `Dispatcher.run`;
+from an `async def` function, await `Dispatcher.dispatch` directly.
+"""
+
+import json
+import random
+import asyncio
+
+import aiohttp
+
+
+DEFAULT_HOST = 'https://api.ubiops.com/v2.1'
+# Responses that are retried, other error responses (e.g. invalid input) fail directly
+RETRY_STATUSES = {408, 429, 500, 502, 503, 504}
+
+
+class RequestError(Exception):
+
+    def __init__(self, status, body):
+        super().__init__(f"Request failed with status {status}: {body}")
+        self.status = status
+        self.body = body
+
+
+class RetryableRequestError(RequestError):
+
+    def __init__(self, status, body, retry_after=None):
+        super().__init__(status, body)
+        self.retry_after = retry_after
+
+
+async def fan_out(send, payloads, concurrency=50, retries=3, backoff=0.5, max_backoff=10.0,
+                  retry_on=(Exception,), return_exceptions=False):
+    """
+    Call `send` for every payload with at most `concurrency` calls in flight, and return the results in the order of
+    the payloads
+
+    :param callable send: coroutine function that sends a single payload and returns its result
+    :param list payloads: payloads to send
+    :param int concurrency: maximum number of payloads in flight
+    :param int retries: maximum number of retries of a payload
+    :param float backoff: delay before the first retry in seconds, doubled for every next retry. A random jitter is
+        applied so retries of concurrent payloads are spread out.
+    :param float max_backoff: maximum delay between retries in seconds
+    :param tuple retry_on: errors after which a payload is retried
+    :param bool return_exceptions: return the error of a payload that failed after all retries in place of its
+        result, instead of raising the first error
+    :return list: result of every payload
+    """
+
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def send_with_retries(payload):
+        for attempt in range(retries + 1):
+            async with semaphore:
+                try:
+                    return await send(payload)
+                except retry_on as e:
+                    if attempt == retries:
+                        raise
+                    delay = getattr(e, 'retry_after', None)
+
+            # Sleep without holding a slot, so other payloads can be sent in the meantime
+            if delay is None:
+                delay = random.uniform(0, min(max_backoff, backoff * 2 ** attempt))
+            await asyncio.sleep(delay)
+
+    return await asyncio.gather(*[send_with_retries(payload) for payload in payloads],
+                                return_exceptions=return_exceptions)
+
+
+class Dispatcher:
+
+    def __init__(self, token, project_name, host=DEFAULT_HOST, concurrency=50, retries=3, backoff=0.5,
+                 max_backoff=10.0, timeout=300):
+        """
+        :param str token: UbiOps API token, with or without the 'Token ' prefix
+        :param str project_name: name of the project
+        :param str host: URL of the UbiOps API
+        :param int concurrency: maximum number of requests in flight, which is also the number of connections used
+        :param int retries: maximum number of retries of a request, after a connection error or a retryable response
+        :param float backoff: delay before the first retry in seconds, doubled for every next retry
+        :param float max_backoff: maximum delay between retries in seconds
+        :param float timeout: maximum number of seconds a single request may take
+        """
+
+        self.token = token if token.startswith('Token ') else f"Token {token}"
+        self.project_name = project_name
+        self.host = host.rstrip('/')
+        self.concurrency = concurrency
+        self.retries = retries
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.timeout = timeout
+
+    def deployment_path(self, deployment_name, version=None):
+        """
+        Path of the requests of a deployment version, or of the default version of the deployment
+        """
+
+        path = f"/projects/{self.project_name}/deployments/{deployment_name}"
+        return f"{path}/versions/{version}/requests" if version else f"{path}/requests"
+
+    def pipeline_path(self, pipeline_name, version=None):
+        """
+        Path of the requests of a pipeline version, or of the default version of the pipeline
+        """
+
+        path = f"/projects/{self.project_name}/pipelines/{pipeline_name}"
+        return f"{path}/versions/{version}/requests" if version else f"{path}/requests"
+
+    async def dispatch(self, path, payloads, return_exceptions=False):
+        """
+        Send a request with every payload to the path, and return the responses in the order of the payloads
+
+        :param str path: path of the requests, e.g. from `deployment_path` or `pipeline_path`. Append '/batch' to
+            send every payload (a list of request inputs) as a batch request.
+        :param list payloads: request inputs, a dictionary for structured and a string for plain input
+        :param bool return_exceptions: return the error of a request that failed in place of its response, instead
+            of raising the first error
+        :return list: the response of every request, as a dictionary
+        """
+
+        url = f"{self.host}{path}"
+        headers = {'Authorization': self.token, 'Accept': 'application/json'}
+        connector = aiohttp.TCPConnector(limit=self.concurrency)
+        timeout = aiohttp.ClientTimeout(total=self.timeout)
+
+        async with aiohttp.ClientSession(connector=connector, timeout=timeout, headers=headers) as session:
+
+            async def send(payload):
+                if isinstance(payload, str):
+                    kwargs = {'data': payload, 'headers': {'Content-Type': 'text/plain'}}
+                else:
+                    kwargs = {'json': payload}
+
+                async with session.post(url, **kwargs) as response:
+                    body = await response.text()
+                    if response.status in RETRY_STATUSES:
+                        retry_after = response.headers.get('Retry-After')
+                        raise RetryableRequestError(
+                            response.status, body,
+                            retry_after=float(retry_after) if retry_after and retry_after.isdigit() else None
+                        )
+                    if response.status >= 400:
+                        raise RequestError(response.status, body)
+                    return json.loads(body)
+
+            return await fan_out(
+                send, payloads,
+                concurrency=self.concurrency,
+                retries=self.retries,
+                backoff=self.backoff,
+                max_backoff=self.max_backoff,
+                retry_on=(RetryableRequestError, aiohttp.ClientConnectionError, asyncio.TimeoutError),
+                return_exceptions=return_exceptions
+            )
+
+    def run(self, path, payloads, return_exceptions=False):
+        """
+        Synchronous version of `dispatch`, for functions that aren't running an event loop
+        """
+
+        return asyncio.run(self.dispatch(path, payloads, return_exceptions=return_exceptions))
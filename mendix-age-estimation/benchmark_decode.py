@@ -0,0 +1,82 @@
+"""
+Compare the decoding of base64 encoded photos with PIL (the original `base64_to_image`) and with the OpenCV decode path
+of the deployment, on synthetic JPEG photos of several sizes.
+
+Usage:
+    python benchmark_decode.py --repeats 20
+"""
+
+import io
+import os
+import sys
+import time
+import base64
+import argparse
+
+import cv2
+import numpy as np
+from PIL import Image
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), 'deployment_package_caffe'))
+
+from image_decoding import base64_to_image  # noqa: E402
+
+
+SIZES = [(640, 480), (1280, 720), (1920, 1080), (4032, 3024)]
+
+
+def base64_to_image_pil(enc_str):
+    # The original implementation of base64_to_image
+    dec_str = base64.b64decode(str(enc_str))
+    img = Image.open(io.BytesIO(dec_str))
+    img_arr = np.asarray(img)
+    res = cv2.resize(img_arr, dsize=(224, 224), interpolation=cv2.INTER_CUBIC)
+
+    return res
+
+
+def synthetic_photo(width, height, seed=0):
+    """
+    A base64 encoded JPEG photo with smooth gradients and some noise, which compresses like a real photo
+    """
+
+    rng = np.random.default_rng(seed)
+    y, x = np.mgrid[0:height, 0:width]
+    img = np.stack([
+        (x * 255 // width), (y * 255 // height), ((x + y) * 255 // (width + height))
+    ], axis=-1).astype(np.int16)
+    img = np.clip(img + rng.integers(-20, 20, img.shape), 0, 255).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(img).save(buffer, 'JPEG', quality=90)
+    return base64.b64encode(buffer.getvalue()).decode()
+
+
+def measure(decode, photo, repeats):
+    decode(photo)
+    start = time.perf_counter()
+    for _ in range(repeats):
+        decode(photo)
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare the PIL and OpenCV photo decoding",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument('--repeats', type=int, default=20, help="number of decodes per photo size")
+    args = parser.parse_args()
+
+    out = np.empty((224, 224, 3), dtype=np.uint8)
+    print(f"{'photo':>12} {'PIL (ms)':>10} {'OpenCV (ms)':>12} {'speedup':>8} {'mean abs diff':>14}")
+    for width, height in SIZES:
+        photo = synthetic_photo(width, height)
+        pil_ms = measure(base64_to_image_pil, photo, args.repeats)
+        cv_ms = measure(lambda p: base64_to_image(p, out=out), photo, args.repeats)
+
+        # Both return RGB, the difference comes from the reduced resolution decoding and the interpolation
+        diff = np.abs(base64_to_image_pil(photo).astype(np.int16) - base64_to_image(photo).astype(np.int16)).mean()
+        print(f"{width:>5}x{height:<6} {pil_ms:>10.2f} {cv_ms:>12.2f} {pil_ms / cv_ms:>7.1f}x {diff:>14.2f}")
+
+
+if __name__ == '__main__':
+    main()
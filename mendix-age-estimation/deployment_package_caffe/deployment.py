@@ -1,27 +1,33 @@
 from setup_logging import setup_logging
+from instrumentation import stage
 import logging
 import sys
 sys.path.append('/usr/lib/python3/dist-packages') # We need to point to the location where Caffe installs its Python lib
 import os
-import cv2
 import caffe
 import numpy as np
-from PIL import Image
-import base64
-import io
+from concurrent.futures import ThreadPoolExecutor
 
+from image_decoding import IMAGE_SIZE, base64_to_image
 
-def base64_to_image(enc_str):
+
+def decode_photos(encoded_photos, executor, out):
     """
-    Decodes a base64 string to an image and returns it as a Numpy array.
-    The image will be resized using OpenCV to a resolution of 224x224 pixels.
+    Decodes base64 strings to images in a thread pool, into a preallocated array. OpenCV releases the GIL while
+    decoding and resizing, so the photos are decoded in parallel.
+
+    :param list encoded_photos: base64 encoded photos
+    :param concurrent.futures.Executor executor: executor to decode the photos in
+    :param np.ndarray out: uint8 array of shape (N, 224, 224, 3) with N at least the number of photos
+    :return np.ndarray: the part of out holding the decoded photos
     """
-    dec_str = base64.b64decode(str(enc_str))
-    img = Image.open(io.BytesIO(dec_str))
-    img_arr = np.asarray(img)
-    res = cv2.resize(img_arr, dsize=(224, 224), interpolation=cv2.INTER_CUBIC)
 
-    return res
+    def decode(i):
+        base64_to_image(encoded_photos[i], out=out[i])
+
+    # Consuming the results raises the first error, if any
+    list(executor.map(decode, range(len(encoded_photos))))
+    return out[:len(encoded_photos)]
 
 
 class Deployment:
@@ -42,27 +48,58 @@ class Deployment:
 
         self.net = caffe.Classifier(model_def_file, caffe_model)
 
+        # Photos are decoded in a thread pool and sent through the net in batches of at most BATCH_SIZE photos
+        self.batch_size = int(os.environ.get('BATCH_SIZE', 32))
+        self.executor = ThreadPoolExecutor(max_workers=int(os.environ.get('DECODE_WORKERS', 4)))
+        self.photos = np.empty((self.batch_size, IMAGE_SIZE, IMAGE_SIZE, 3), dtype=np.uint8)
+
+    def estimate_ages(self, encoded_photos):
+        """
+        Estimate the age of every photo. Every batch of photos is sent through the net in a single forward pass, with
+        the input of the net reshaped to the size of the batch.
+
+        :param list encoded_photos: base64 encoded photos
+        :return list: estimated age of every photo
+        """
+
+        input_name = self.net.inputs[0]
+        ages = []
+        for start in range(0, len(encoded_photos), self.batch_size):
+            with stage('decode'):
+                photos = decode_photos(encoded_photos[start:start + self.batch_size], self.executor, self.photos)
 
+            with stage('predict'):
+                # Caffe keeps the memory of a blob when it shrinks, changing the batch size only allocates when it grows
+                if self.net.blobs[input_name].data.shape[0] != len(photos):
+                    self.net.blobs[input_name].reshape(len(photos), 3, IMAGE_SIZE, IMAGE_SIZE)
+                    self.net.reshape()
+
+                # The net expects channels first, this is the same input Classifier.predict creates without oversampling
+                self.net.blobs[input_name].data[...] = photos.transpose(0, 3, 1, 2)
+                out = self.net.forward()[self.net.outputs[0]]
+
+            # From the output array we take the index of the largest value. The out array holds probabilities for
+            # ages 1-100.
+            ages.extend(int(age) for age in out.argmax(axis=1))
+
+        return ages
+
+
+    @stage('request')
     def request(self, data):
         """
         Method for model requests, called for every individual request
 
         :param dict data: dictionary with the model data. In this case it will hold a key 'photo' with a base64 string
-        as value.
+        as value, or a key 'photos' with a list of base64 strings.
         :return dict prediction: JSON serializable dictionary with the output fields as defined on model creation
         """
 
         logging.info("Processing model request")
 
-        # Convert the base64 string input to a Numpy array of the right format. Using the function defined above.
-        photo_data = base64_to_image(data['photo'])
-
-        # Call the predict function of the Caffe net
-        out = self.net.predict([photo_data], oversample=False)
-
-        # From the output array we return the index of the largest value. The out array holds probabilities for
-        # ages 1-100.
-        age = out[0].argmax()
+        # A version with the input field 'photos' accepts a list of photos, and returns a list of ages
+        if 'photos' in data:
+            return {'ages': self.estimate_ages(data['photos'])}
 
         # Here we return a JSON with the estimated age as integer
-        return {'age': int(age)}
+        return {'age': self.estimate_ages([data['photo']])[0]}
@@ -0,0 +1,95 @@
+"""
+Decoding of base64 encoded photos into the 224x224 RGB arrays the net expects.
+
+The base64 string is decoded once, and OpenCV decodes the image straight from those bytes, without intermediate copies.
+Large JPEG photos are decoded at a reduced resolution (1/2, 1/4 or 1/8 of their size), which skips most of the decoding
+work, and the result is resized directly into a preallocated array. OpenCV rotates photos according to their EXIF
+orientation, and returns 3 channels for grayscale photos and photos with an alpha channel as well.
+"""
+
+import binascii
+
+import cv2
+import numpy as np
+
+
+IMAGE_SIZE = 224
+
+# Decoding flags by the factor the resolution is reduced with, largest factor first
+_REDUCED_FLAGS = [
+    (8, cv2.IMREAD_REDUCED_COLOR_8),
+    (4, cv2.IMREAD_REDUCED_COLOR_4),
+    (2, cv2.IMREAD_REDUCED_COLOR_2),
+]
+
+# JPEG start of frame markers, which hold the size of the image
+_SOF_MARKERS = {0xC0, 0xC1, 0xC2, 0xC3, 0xC5, 0xC6, 0xC7, 0xC9, 0xCA, 0xCB, 0xCD, 0xCE, 0xCF}
+
+
+def jpeg_size(data):
+    """
+    Read the (height, width) of a JPEG image from its header, without decoding it
+
+    :param bytes data: encoded image
+    :return tuple: (height, width), or None if the data isn't a JPEG image or its size can't be found
+    """
+
+    if data[:2] != b'\xff\xd8':
+        return None
+
+    i = 2
+    while i + 9 <= len(data):
+        if data[i] != 0xFF:
+            return None
+        marker = data[i + 1]
+        if marker == 0xFF:
+            # Padding before a marker
+            i += 1
+            continue
+        if marker in _SOF_MARKERS:
+            return int.from_bytes(data[i + 5:i + 7], 'big'), int.from_bytes(data[i + 7:i + 9], 'big')
+        # Skip the segment, its length includes the 2 length bytes
+        i += 2 + int.from_bytes(data[i + 2:i + 4], 'big')
+    return None
+
+
+def decode_flag(data, size=IMAGE_SIZE):
+    """
+    The OpenCV decoding flag with the largest resolution reduction that keeps both sides at least `size` pixels
+    """
+
+    dims = jpeg_size(data)
+    if dims is not None:
+        for factor, flag in _REDUCED_FLAGS:
+            if min(dims) // factor >= size:
+                return flag
+    return cv2.IMREAD_COLOR
+
+
+def base64_to_image(enc_str, out=None, size=IMAGE_SIZE, rgb=True):
+    """
+    Decodes a base64 string to an image and returns it as a Numpy array.
+    The image will be resized using OpenCV to a resolution of 224x224 pixels.
+
+    :param str enc_str: base64 encoded image
+    :param np.ndarray out: uint8 array of shape (size, size, 3) to write the image to, a new array is created if None
+    :param int size: width and height of the resized image
+    :param bool rgb: return the channels in RGB order, like decoding with PIL does, instead of the BGR order of OpenCV
+    :return np.ndarray: the resized image
+    """
+
+    data = binascii.a2b_base64(enc_str)
+    # A view on the decoded bytes, not a copy
+    img = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), decode_flag(data, size))
+    if img is None:
+        raise ValueError("The photo could not be decoded")
+
+    if out is None:
+        out = np.empty((size, size, 3), dtype=np.uint8)
+
+    # Area interpolation gives the best quality when shrinking, cubic interpolation when enlarging
+    interpolation = cv2.INTER_AREA if min(img.shape[:2]) >= size else cv2.INTER_CUBIC
+    cv2.resize(img, dsize=(size, size), dst=out, interpolation=interpolation)
+    if rgb:
+        cv2.cvtColor(out, cv2.COLOR_BGR2RGB, dst=out)
+    return out
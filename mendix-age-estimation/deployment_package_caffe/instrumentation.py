@@ -0,0 +1,281 @@
+"""
+Lightweight timings and peak memory per stage of a request.
+
+Stages are marked with `stage`, as a decorator or a context manager, and can be nested:
+
+    @stage('request')
+    def request(self, data):
+        with stage('load'):
+            ...
+        with stage('predict'):
+            ...
+
+Entering and leaving a stage only appends a tuple to an in-memory buffer. A background thread writes the buffer as JSON
+lines every few seconds, so writing never happens during a request. Every line holds the stage path (e.g.
+'request;predict'), the duration in milliseconds and the memory growth of the stage.
+
+It is configured with environment variables:
+
+- INSTRUMENTATION: set to 'false' to turn all stages into no-ops
+- INSTRUMENTATION_OUTPUT: file to append the lines to, the standard output (the deployment logs) if not set
+- INSTRUMENTATION_FLUSH_INTERVAL: number of seconds between writes, 5 by default
+- INSTRUMENTATION_MEMORY: 'rss' (default) records by how much the peak resident memory of the process grew during the
+  stage, which only costs two system calls. 'python' records the peak of Python allocations during the stage with
+  tracemalloc, which is more precise but slows down allocations considerably. It needs Python 3.9 or later, on older
+  versions 'rss' is used instead.
+
+Run this file to aggregate the lines of one or more files (e.g. downloaded logs) into a summary per stage and, with
+`--folded`, into folded stacks for flame graph tools:
+
+    python instrumentation.py logs.txt
+    python instrumentation.py logs.txt --folded > stacks.txt
+"""
+
+import os
+import sys
+import json
+import time
+import atexit
+import resource
+import argparse
+import threading
+import tracemalloc
+from collections import deque, defaultdict
+from contextlib import ContextDecorator
+
+
+class Recorder:
+
+    def __init__(self, output=None, flush_interval=5.0, memory='rss', enabled=True):
+        """
+        :param str output: file to append the records to, the standard output if None
+        :param float flush_interval: number of seconds between writes of the buffered records
+        :param str memory: how memory is measured, 'rss', 'python' or 'none'
+        :param bool enabled: record stages, if False all stages are no-ops
+        """
+
+        if memory == 'python' and not hasattr(tracemalloc, 'reset_peak'):
+            # Peaks per stage need tracemalloc.reset_peak, which was added in Python 3.9
+            print("INSTRUMENTATION_MEMORY 'python' needs Python 3.9 or later, measuring 'rss' instead")
+            memory = 'rss'
+
+        self.output = output
+        self.flush_interval = flush_interval
+        self.memory = memory
+        self.enabled = enabled
+
+        # (stage path, start time, duration in seconds, memory in bytes), appending to a deque is thread safe
+        self._buffer = deque()
+        self._local = threading.local()
+        self._write_lock = threading.Lock()
+        self._flusher = None
+
+        if enabled and memory == 'python' and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def stage(self, name):
+        """
+        Mark a stage, as a decorator or a context manager
+        """
+
+        return _Stage(self, name)
+
+    def flush(self):
+        """
+        Write all buffered records
+        """
+
+        lines = []
+        while True:
+            try:
+                path, start, duration, memory = self._buffer.popleft()
+            except IndexError:
+                break
+            lines.append(json.dumps({
+                'stage': path, 'start': start, 'ms': round(duration * 1000, 3), 'memory_kb': memory // 1024
+            }))
+
+        if not lines:
+            return
+        with self._write_lock:
+            if self.output:
+                with open(self.output, 'a') as f:
+                    f.write('\n'.join(lines) + '\n')
+            else:
+                sys.stdout.write('\n'.join(lines) + '\n')
+                sys.stdout.flush()
+
+    def _enter(self, name):
+        stack = getattr(self._local, 'stack', None)
+        if stack is None:
+            stack = self._local.stack = []
+            self._start_flusher()
+
+        if self.memory == 'rss':
+            memory_start = _max_rss()
+        elif self.memory == 'python':
+            # The peak is reset for every stage, the peak of the outer stage up to now is kept in its frame
+            memory_start, peak = tracemalloc.get_traced_memory()
+            tracemalloc.reset_peak()
+            if stack:
+                stack[-1][4] = max(stack[-1][4], peak)
+        else:
+            memory_start = 0
+
+        path = f"{stack[-1][0]};{name}" if stack else name
+        # [stage path, memory at the start, start time, wall clock start time, highest peak of earlier parts]
+        stack.append([path, memory_start, time.perf_counter(), time.time(), 0])
+
+    def _exit(self):
+        end = time.perf_counter()
+        stack = self._local.stack
+        path, memory_start, start, wall_start, earlier_peak = stack.pop()
+
+        if self.memory == 'rss':
+            memory = _max_rss() - memory_start
+        elif self.memory == 'python':
+            peak = max(tracemalloc.get_traced_memory()[1], earlier_peak)
+            memory = max(peak - memory_start, 0)
+            if stack:
+                stack[-1][4] = max(stack[-1][4], peak)
+        else:
+            memory = 0
+
+        self._buffer.append((path, wall_start, end - start, memory))
+
+    def _start_flusher(self):
+        if self._flusher is not None:
+            return
+        with self._write_lock:
+            if self._flusher is None:
+                self._flusher = threading.Thread(target=self._flush_periodically, daemon=True)
+                self._flusher.start()
+                atexit.register(self.flush)
+
+    def _flush_periodically(self):
+        while True:
+            time.sleep(self.flush_interval)
+            try:
+                self.flush()
+            except Exception as e:
+                print('There was a problem writing the instrumentation records!')
+                print(e)
+
+
+class _Stage(ContextDecorator):
+
+    def __init__(self, recorder, name):
+        self.recorder = recorder
+        self.name = name
+
+    def __enter__(self):
+        if self.recorder.enabled:
+            self.recorder._enter(self.name)
+        return self
+
+    def __exit__(self, *exc):
+        if self.recorder.enabled:
+            self.recorder._exit()
+        return False
+
+
+def _max_rss():
+    # Kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+recorder = Recorder(
+    output=os.environ.get('INSTRUMENTATION_OUTPUT') or None,
+    flush_interval=float(os.environ.get('INSTRUMENTATION_FLUSH_INTERVAL', 5)),
+    memory=os.environ.get('INSTRUMENTATION_MEMORY', 'rss'),
+    enabled=os.environ.get('INSTRUMENTATION', 'true').lower() == 'true'
+)
+stage = recorder.stage
+flush = recorder.flush
+
+
+def read_records(paths):
+    """
+    Read the records from files, skipping all other lines such as log messages
+    """
+
+    for path in paths:
+        with open(path) as f:
+            for line in f:
+                start = line.find('{"stage"')
+                if start == -1:
+                    continue
+                try:
+                    yield json.loads(line[start:])
+                except ValueError:
+                    continue
+
+
+def summarize(records):
+    """
+    Aggregate records per stage path
+
+    :return dict: stage path -> dictionary with the count, total, self time and percentiles in ms and max memory
+    """
+
+    durations = defaultdict(list)
+    memory = defaultdict(int)
+    for record in records:
+        durations[record['stage']].append(record['ms'])
+        memory[record['stage']] = max(memory[record['stage']], record['memory_kb'])
+
+    summary = {}
+    for path, values in durations.items():
+        values.sort()
+        # Self time is the time not spent in the direct child stages
+        children = sum(
+            sum(child_values) for child, child_values in durations.items()
+            if child.startswith(path + ';') and ';' not in child[len(path) + 1:]
+        )
+        summary[path] = {
+            'count': len(values),
+            'total_ms': sum(values),
+            'self_ms': max(sum(values) - children, 0),
+            'mean_ms': sum(values) / len(values),
+            'p50_ms': values[len(values) // 2],
+            'p95_ms': values[min(int(len(values) * 0.95), len(values) - 1)],
+            'max_memory_kb': memory[path]
+        }
+    return summary
+
+
+def print_summary(summary, width=30):
+    """
+    Print the stages as an indented tree, with a bar showing the share of the total time of the root stages
+    """
+
+    root_total = sum(stats['total_ms'] for path, stats in summary.items() if ';' not in path) or 1
+    print(f"{'stage':<40} {'count':>8} {'mean ms':>10} {'p50 ms':>10} {'p95 ms':>10} {'self %':>7} "
+          f"{'memory kB':>10}  share")
+    for path in sorted(summary):
+        stats = summary[path]
+        depth = path.count(';')
+        name = '  ' * depth + path.rsplit(';', 1)[-1]
+        share = stats['total_ms'] / root_total
+        print(f"{name:<40} {stats['count']:>8} {stats['mean_ms']:>10.2f} {stats['p50_ms']:>10.2f} "
+              f"{stats['p95_ms']:>10.2f} {100 * stats['self_ms'] / root_total:>6.1f}% "
+              f"{stats['max_memory_kb']:>10}  {'#' * round(share * width)}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Summarize the instrumentation records of a deployment")
+    parser.add_argument('paths', nargs='+', help="files with instrumentation records, e.g. downloaded logs")
+    parser.add_argument('--folded', action='store_true',
+                        help="print folded stacks with the self time in microseconds, for flame graph tools")
+    args = parser.parse_args()
+
+    summary = summarize(read_records(args.paths))
+    if args.folded:
+        for path in sorted(summary):
+            print(f"{path} {round(summary[path]['self_ms'] * 1000)}")
+    else:
+        print_summary(summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,16 +1,141 @@
+import os
+import json
+import time
+import queue
+import atexit
+import random
 import logging
 import logging.config
+import logging.handlers
 
 
-def setup_logging(log_level='INFO'):
+LEVEL_NAMES = {
+    logging.DEBUG: 'debug',
+    logging.INFO: 'info',
+    logging.WARNING: 'warning',
+    logging.ERROR: 'error',
+    logging.CRITICAL: 'critical',
+}
+
+_listener = None
+
+
+def _stop_listener():
+    """
+    Write the remaining queued records and stop the background thread
+    """
+
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Puts records on a queue that is read in the same process, so they are not formatted before they are queued
+    """
+
+    def prepare(self, record):
+        # Only merge the arguments into the message, as they may change after the call. The record is formatted by the
+        # handler in the background thread.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """
+    Formats every record as a single JSON line
+    """
+
+    def format(self, record):
+        line = {
+            'time': time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(record.created)) + f".{int(record.msecs):03d}Z",
+            'level': LEVEL_NAMES.get(record.levelno, str(record.levelno)),
+            'logger': record.name,
+            'message': record.getMessage(),
+        }
+        if getattr(record, 'sample_rate', 1.0) < 1.0:
+            # Every logged record stands for 1 / sample_rate records
+            line['sample_rate'] = record.sample_rate
+        if record.exc_info:
+            line['exception'] = self.formatException(record.exc_info)
+        return json.dumps(line)
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Keeps only a fraction of the records of some loggers. Warnings and errors are always kept.
+    """
+
+    def __init__(self, sample_rates):
+        """
+        :param dict sample_rates: logger name -> fraction of records to keep, also applied to its child loggers
+        """
+
+        super().__init__()
+        self.sample_rates = sample_rates
+        # logger name -> sample rate, including child loggers
+        self._rates = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+
+        rate = self._rates.get(record.name)
+        if rate is None:
+            rate = self._rates[record.name] = self._rate(record.name)
+        if rate >= 1.0:
+            return True
+
+        record.sample_rate = rate
+        return random.random() < rate
+
+    def _rate(self, name):
+        while name:
+            if name in self.sample_rates:
+                return self.sample_rates[name]
+            name = name.rpartition('.')[0]
+        return 1.0
+
+
+def parse_sample_rates(value):
+    """
+    Parse sample rates in the format 'logger name=rate,other logger=rate'
+    """
+
+    rates = {}
+    for item in value.split(','):
+        if '=' in item:
+            name, rate = item.rsplit('=', 1)
+            rates[name.strip()] = float(rate)
+    return rates
+
+
+def setup_logging(log_level='INFO', json_lines=None, background=None, sample_rates=None):
     """
     Setup and configure the logging
 
-    :param str base_directory: base directory of the app. The 'log' directory is created in here.
-    :param str log_path: path to write logs to, relative from the base_directory
     :param str log_level: indicator of how verbose the logging is
+    :param bool json_lines: write every record as a JSON line instead of formatted text. If None, this is enabled by
+        setting the environment variable LOG_FORMAT to 'json'.
+    :param bool background: let a background thread write the records, so logging only puts them on a queue. If None,
+        this is enabled by setting the environment variable LOG_BACKGROUND to 'true'.
+    :param dict sample_rates: logger name -> fraction of its debug and info records to keep, to reduce the number of
+        messages from hot paths. If None, it is read from the environment variable LOG_SAMPLE_RATES, in the format
+        'logger name=0.01,other logger=0.1'.
     """
 
+    global _listener
+
+    if json_lines is None:
+        json_lines = os.environ.get('LOG_FORMAT', 'text').lower() == 'json'
+    if background is None:
+        background = os.environ.get('LOG_BACKGROUND', 'false').lower() == 'true'
+    if sample_rates is None:
+        sample_rates = parse_sample_rates(os.environ.get('LOG_SAMPLE_RATES', ''))
+
     # Configure the logging. We do it here once, after which it will apply everywhere in the project where the logging
     # module is imported
     log_config = {
@@ -20,12 +145,15 @@ def setup_logging(log_level='INFO'):
             'standard': {
                 'format': '%(levelname)s %(asctime)s - [%(name)s] %(message)s',
                 'datefmt': '%Y-%m-%d %H:%M:%S'
+            },
+            'json': {
+                '()': JsonFormatter
             }
         },
         'handlers': {
             'console': {
                 'level': log_level.upper(),
-                'formatter': 'standard',
+                'formatter': 'json' if json_lines else 'standard',
                 'class': 'logging.StreamHandler',
             }
         },
@@ -37,6 +165,8 @@ def setup_logging(log_level='INFO'):
         }
     }
 
+    _stop_listener()
+
     # Save our configuration
     logging.config.dictConfig(log_config)
 
@@ -46,4 +176,22 @@ def setup_logging(log_level='INFO'):
     logging.addLevelName(logging.INFO, '[Info]    ')
     logging.addLevelName(logging.WARNING, '[Warning] ')
     logging.addLevelName(logging.ERROR, '[Error]   ')
-    logging.addLevelName(logging.CRITICAL, '[Critical]')
\ No newline at end of file
+    logging.addLevelName(logging.CRITICAL, '[Critical]')
+
+    root = logging.getLogger()
+    console = root.handlers[0]
+
+    if background:
+        # The console handler is moved to a background thread, the logging calls only put records on the queue
+        records = queue.Queue(-1)
+        queue_handler = _QueueHandler(records)
+        queue_handler.setLevel(console.level)
+        root.handlers = [queue_handler]
+
+        _listener = logging.handlers.QueueListener(records, console, respect_handler_level=True)
+        _listener.start()
+        atexit.register(_stop_listener)
+
+    if sample_rates:
+        # Records are dropped before they are formatted or queued
+        root.handlers[0].addFilter(SamplingFilter(sample_rates))
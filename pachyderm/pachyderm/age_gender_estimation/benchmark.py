@@ -0,0 +1,131 @@
+import os
+os.environ.setdefault("CUDA_VISIBLE_DEVICES", "-1")  # benchmark on CPU
+
+import json
+import time
+import argparse
+import tempfile
+from pathlib import Path
+import cv2
+import numpy as np
+import pandas as pd
+import tensorflow as tf
+from omegaconf import OmegaConf
+from src.factory import get_model, get_optimizer
+from src.generator import ImageSequence
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="This script measures training throughput on synthetic images "
+                                                 "and reports where the time goes (data loading or compute) as JSON.",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--model_name", type=str, default="EfficientNetB3",
+                        help="model name available in tensorflow.keras.applications")
+    parser.add_argument("--img_size", type=int, default=224,
+                        help="input image size")
+    parser.add_argument("--batch_size", type=int, default=32,
+                        help="batch size")
+    parser.add_argument("--steps", type=int, default=5,
+                        help="number of measured training steps")
+    parser.add_argument("--warmup_steps", type=int, default=1,
+                        help="number of training steps excluded from the measurement")
+    parser.add_argument("--source_size", type=int, default=256,
+                        help="size of the synthetic source images before resizing")
+    parser.add_argument("--seed", type=int, default=42,
+                        help="random seed")
+    parser.add_argument("--output", type=str, default=None,
+                        help="path to write the JSON report to; printed to stdout if not set")
+    args = parser.parse_args()
+    return args
+
+
+def create_synthetic_dataset(image_dir, sample_num, source_size, rng):
+    img_paths = []
+
+    for i in range(sample_num):
+        img = rng.integers(0, 256, size=(source_size, source_size, 3), dtype=np.uint8)
+        img_path = f"{i:06d}.jpg"
+        cv2.imwrite(str(image_dir.joinpath(img_path)), img)
+        img_paths.append(img_path)
+
+    return pd.DataFrame(data=dict(genders=rng.integers(0, 2, size=sample_num),
+                                  ages=rng.integers(0, 101, size=sample_num),
+                                  img_paths=img_paths))
+
+
+def benchmark_data_pipeline(gen):
+    start_time = time.perf_counter()
+
+    for i in range(len(gen)):
+        gen[i]
+
+    elapsed = time.perf_counter() - start_time
+    return len(gen) * gen.batch_size / elapsed
+
+
+def benchmark_training(model, gen, warmup_steps):
+    data_times = []
+    step_times = []
+
+    for i in range(len(gen)):
+        start_time = time.perf_counter()
+        imgs, (genders, ages) = gen[i]
+        data_time = time.perf_counter() - start_time
+        model.train_on_batch(imgs, [genders, ages])
+        step_time = time.perf_counter() - start_time - data_time
+
+        if i >= warmup_steps:
+            data_times.append(data_time)
+            step_times.append(step_time)
+
+    return np.asarray(data_times), np.asarray(step_times)
+
+
+def main():
+    args = get_args()
+    np.random.seed(args.seed)
+    tf.random.set_seed(args.seed)
+    rng = np.random.default_rng(args.seed)
+
+    cfg = OmegaConf.from_dotlist([f"model.model_name={args.model_name}",
+                                  f"model.img_size={args.img_size}",
+                                  f"train.batch_size={args.batch_size}",
+                                  "train.optimizer_name=adam",
+                                  "train.lr=0.001"])
+    sample_num = (args.steps + args.warmup_steps) * args.batch_size
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        image_dir = Path(tmp_dir)
+        df = create_synthetic_dataset(image_dir, sample_num, args.source_size, rng)
+        gen = ImageSequence(cfg, df, "train", image_dir)
+
+        data_samples_per_sec = benchmark_data_pipeline(gen)
+
+        model = get_model(cfg)
+        model.compile(optimizer=get_optimizer(cfg),
+                      loss=["sparse_categorical_crossentropy", "sparse_categorical_crossentropy"])
+        data_times, step_times = benchmark_training(model, gen, args.warmup_steps)
+
+    total_time = data_times.sum() + step_times.sum()
+    report = {
+        "model_name": args.model_name,
+        "img_size": args.img_size,
+        "batch_size": args.batch_size,
+        "steps": len(step_times),
+        "data_samples_per_sec": data_samples_per_sec,
+        "train_samples_per_sec": len(step_times) * args.batch_size / total_time,
+        "mean_data_time_sec": data_times.mean(),
+        "mean_step_time_sec": step_times.mean(),
+        "data_wait_fraction": data_times.sum() / total_time,
+    }
+    report = {k: float(v) if isinstance(v, np.floating) else v for k, v in report.items()}
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
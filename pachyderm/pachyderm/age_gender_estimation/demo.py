@@ -1,4 +1,7 @@
 from pathlib import Path
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import time
 import cv2
 import dlib
 import numpy as np
@@ -6,7 +9,7 @@ import argparse
 from contextlib import contextmanager
 from omegaconf import OmegaConf
 from tensorflow.keras.utils import get_file
-from src.factory import get_model
+from src.factory import get_model, get_inference_model
 
 
 pretrained_model = "https://github.com/yu4u/age-gender-estimation/releases/download/v0.6/EfficientNetB3_224_weights.11-3.44.hdf5"
@@ -23,6 +26,16 @@ def get_args():
                         help="margin around detected face for age-gender estimation")
     parser.add_argument("--image_dir", type=str, default=None,
                         help="target image directory; if set, images in image_dir are used instead of webcam")
+    parser.add_argument("--output_dir", type=str, default=None,
+                        help="output directory; if set together with image_dir, annotated images are written to "
+                             "output_dir instead of being displayed (headless mode)")
+    parser.add_argument("--batch_size", type=int, default=64,
+                        help="number of faces collected over multiple images per forward pass in headless mode")
+    parser.add_argument("--max_pending_images", type=int, default=64,
+                        help="maximum number of images held in memory while faces are collected in headless mode; "
+                             "a forward pass is run earlier when images contain few faces")
+    parser.add_argument("--num_workers", type=int, default=4,
+                        help="number of threads used to decode and write images in headless mode")
     args = parser.parse_args()
     return args
 
@@ -60,16 +73,134 @@ def yield_images():
             yield img
 
 
+def load_image(image_path):
+    img = cv2.imread(str(image_path), 1)
+
+    if img is not None:
+        h, w, _ = img.shape
+        r = 640 / max(w, h)
+        img = cv2.resize(img, (int(w * r), int(h * r)))
+
+    return img
+
+
 def yield_images_from_dir(image_dir):
     image_dir = Path(image_dir)
 
     for image_path in image_dir.glob("*.*"):
-        img = cv2.imread(str(image_path), 1)
+        img = load_image(image_path)
+
+        if img is not None:
+            yield img
+
+
+def yield_images_from_dir_prefetched(image_dir, executor, prefetch):
+    # decode images in background threads (cv2 releases the GIL), keeping at most `prefetch` images in flight
+    image_paths = iter(Path(image_dir).glob("*.*"))
+    queue = deque()
+
+    for image_path in image_paths:
+        queue.append((image_path, executor.submit(load_image, image_path)))
+
+        if len(queue) >= prefetch:
+            break
+
+    while queue:
+        image_path, future = queue.popleft()
+        next_path = next(image_paths, None)
+
+        if next_path is not None:
+            queue.append((next_path, executor.submit(load_image, next_path)))
+
+        img = future.result()
 
         if img is not None:
-            h, w, _ = img.shape
-            r = 640 / max(w, h)
-            yield cv2.resize(img, (int(w * r), int(h * r)))
+            yield image_path, img
+
+
+def crop_faces(img, detected, margin, img_size):
+    img_h, img_w, _ = np.shape(img)
+    faces = np.empty((len(detected), img_size, img_size, 3), dtype=np.float32)
+
+    for i, d in enumerate(detected):
+        x1, y1, x2, y2, w, h = d.left(), d.top(), d.right() + 1, d.bottom() + 1, d.width(), d.height()
+        xw1 = max(int(x1 - margin * w), 0)
+        yw1 = max(int(y1 - margin * h), 0)
+        xw2 = min(int(x2 + margin * w), img_w - 1)
+        yw2 = min(int(y2 + margin * h), img_h - 1)
+        faces[i] = cv2.resize(img[yw1:yw2 + 1, xw1:xw2 + 1], (img_size, img_size))
+
+    return faces
+
+
+def predict_faces(model, faces):
+    # a single forward pass over all faces; the expected age is computed inside the model
+    predicted_genders, predicted_ages = model.predict_on_batch(faces)
+    return np.asarray(predicted_ages), np.asarray(predicted_genders)
+
+
+def draw_results(img, detected, predicted_ages, predicted_genders):
+    for d, age, gender in zip(detected, predicted_ages, predicted_genders):
+        cv2.rectangle(img, (d.left(), d.top()), (d.right() + 1, d.bottom() + 1), (255, 0, 0), 2)
+        label = "{}, {}".format(int(age), "M" if gender < 0.5 else "F")
+        draw_label(img, (d.left(), d.top()), label)
+
+
+def run_headless(model, detector, image_dir, output_dir, margin, img_size, batch_size, num_workers,
+                 max_pending_images=64):
+    output_dir = Path(output_dir)
+    output_dir.mkdir(parents=True, exist_ok=True)
+    pending = []
+    pending_faces = 0
+    image_num = 0
+    face_num = 0
+    start_time = time.perf_counter()
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        writes = deque()
+
+        def flush():
+            crops = [faces for _, _, _, faces in pending if len(faces) > 0]
+
+            if crops:
+                predicted_ages, predicted_genders = predict_faces(model, np.concatenate(crops))
+
+            offset = 0
+
+            for image_path, img, detected, _ in pending:
+                if len(detected) > 0:
+                    draw_results(img, detected, predicted_ages[offset:offset + len(detected)],
+                                 predicted_genders[offset:offset + len(detected)])
+                    offset += len(detected)
+
+                writes.append(executor.submit(cv2.imwrite, str(output_dir.joinpath(image_path.name)), img))
+
+            pending.clear()
+
+            while writes and (writes[0].done() or len(writes) > max_pending_images):
+                writes.popleft().result()
+
+        for image_path, img in yield_images_from_dir_prefetched(image_dir, executor, prefetch=2 * num_workers):
+            input_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
+            detected = detector(input_img, 1)
+            pending.append((image_path, img, detected, crop_faces(img, detected, margin, img_size)))
+            pending_faces += len(detected)
+            image_num += 1
+            face_num += len(detected)
+
+            # images without (many) faces would otherwise be held until enough faces are found
+            if pending_faces >= batch_size or len(pending) >= max_pending_images:
+                flush()
+                pending_faces = 0
+
+        flush()
+
+        for future in writes:
+            future.result()
+
+    elapsed = time.perf_counter() - start_time
+    print("Processed {} images ({} faces) in {:.2f} s: {:.2f} images/s".format(
+        image_num, face_num, elapsed, image_num / elapsed if elapsed > 0 else 0.0))
 
 
 def main():
@@ -91,39 +222,29 @@ def main():
     cfg = OmegaConf.from_dotlist([f"model.model_name={model_name}", f"model.img_size={img_size}"])
     model = get_model(cfg)
     model.load_weights(weight_file)
+    model = get_inference_model(model)
+
+    if image_dir and args.output_dir:
+        run_headless(model, detector, image_dir, args.output_dir, margin, img_size, args.batch_size,
+                     args.num_workers, args.max_pending_images)
+        return
 
     image_generator = yield_images_from_dir(image_dir) if image_dir else yield_images()
 
     for img in image_generator:
         input_img = cv2.cvtColor(img, cv2.COLOR_BGR2RGB)
-        img_h, img_w, _ = np.shape(input_img)
 
         # detect faces using dlib detector
         detected = detector(input_img, 1)
-        faces = np.empty((len(detected), img_size, img_size, 3))
 
         if len(detected) > 0:
-            for i, d in enumerate(detected):
-                x1, y1, x2, y2, w, h = d.left(), d.top(), d.right() + 1, d.bottom() + 1, d.width(), d.height()
-                xw1 = max(int(x1 - margin * w), 0)
-                yw1 = max(int(y1 - margin * h), 0)
-                xw2 = min(int(x2 + margin * w), img_w - 1)
-                yw2 = min(int(y2 + margin * h), img_h - 1)
-                cv2.rectangle(img, (x1, y1), (x2, y2), (255, 0, 0), 2)
-                # cv2.rectangle(img, (xw1, yw1), (xw2, yw2), (255, 0, 0), 2)
-                faces[i] = cv2.resize(img[yw1:yw2 + 1, xw1:xw2 + 1], (img_size, img_size))
+            faces = crop_faces(img, detected, margin, img_size)
 
             # predict ages and genders of the detected faces
-            results = model.predict(faces)
-            predicted_genders = results[0]
-            ages = np.arange(0, 101).reshape(101, 1)
-            predicted_ages = results[1].dot(ages).flatten()
+            predicted_ages, predicted_genders = predict_faces(model, faces)
 
             # draw results
-            for i, d in enumerate(detected):
-                label = "{}, {}".format(int(predicted_ages[i]),
-                                        "M" if predicted_genders[i][0] < 0.5 else "F")
-                draw_label(img, (d.left(), d.top()), label)
+            draw_results(img, detected, predicted_ages, predicted_genders)
 
         cv2.imshow("result", img)
         key = cv2.waitKey(-1) if image_dir else cv2.waitKey(30)
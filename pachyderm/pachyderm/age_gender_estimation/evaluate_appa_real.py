@@ -1,4 +1,5 @@
 import os
+from concurrent.futures import ThreadPoolExecutor
 import cv2
 import numpy as np
 import pandas as pd
@@ -6,8 +7,9 @@ import argparse
 from tqdm import tqdm
 from pathlib import Path
 from omegaconf import OmegaConf
+from tensorflow.keras.callbacks import Callback
 from tensorflow.keras.utils import get_file
-from src.factory import get_model
+from src.factory import get_model, get_inference_model
 
 
 pretrained_model = "https://github.com/yu4u/age-gender-estimation/releases/download/v0.6/EfficientNetB3_224_weights.11-3.44.hdf5"
@@ -20,10 +22,92 @@ def get_args():
                                      formatter_class=argparse.ArgumentDefaultsHelpFormatter)
     parser.add_argument("--weight_file", type=str, default=None,
                         help="path to weight file (e.g. weights.28-3.73.hdf5)")
+    parser.add_argument("--batch_size", type=int, default=128,
+                        help="number of images per forward pass")
+    parser.add_argument("--num_workers", type=int, default=4,
+                        help="number of threads used to decode validation images")
     args = parser.parse_args()
     return args
 
 
+def load_image(image_path, img_size):
+    return cv2.resize(cv2.imread(str(image_path), 1), (img_size, img_size))
+
+
+def yield_batches(image_paths, img_size, batch_size, executor):
+    # the images of the next batch are decoded in the background while the current batch is predicted
+    batches = [image_paths[i:i + batch_size] for i in range(0, len(image_paths), batch_size)]
+    futures = [executor.submit(load_image, path, img_size) for path in batches[0]] if batches else []
+
+    for i in range(len(batches)):
+        next_futures = [executor.submit(load_image, path, img_size) for path in batches[i + 1]] \
+            if i + 1 < len(batches) else []
+        # the last batch may be smaller than batch_size, so the buffer is sized to the actual batch
+        faces = np.empty((len(futures), img_size, img_size, 3), dtype=np.float32)
+
+        for j, future in enumerate(futures):
+            faces[j] = future.result()
+
+        yield faces
+        futures = next_futures
+
+
+def predict_ages(model, image_paths, img_size, batch_size, num_workers):
+    ages = np.empty(len(image_paths), dtype=np.float32)
+    offset = 0
+
+    with ThreadPoolExecutor(max_workers=num_workers) as executor:
+        with tqdm(total=len(image_paths)) as pbar:
+            for faces in yield_batches(image_paths, img_size, batch_size, executor):
+                _, predicted_ages = model.predict_on_batch(faces)
+                ages[offset:offset + len(faces)] = predicted_ages
+                offset += len(faces)
+                pbar.update(len(faces))
+
+    return ages
+
+
+def evaluate(model, img_size, dataset_root, batch_size=128, num_workers=4):
+    validation_image_dir = dataset_root.joinpath("valid")
+    gt_valid_path = dataset_root.joinpath("gt_avg_valid.csv")
+    image_paths = sorted(validation_image_dir.glob("*_face.jpg"))
+    image_names = [image_path.name[:-9] for image_path in image_paths]
+    ages = predict_ages(model, image_paths, img_size, batch_size, num_workers)
+
+    predictions = pd.DataFrame({"file_name": image_names, "predicted_age": ages})
+    df = pd.read_csv(str(gt_valid_path)).merge(predictions, on="file_name", how="inner")
+    appa_mae = (df["predicted_age"] - df["apparent_age_avg"]).abs().mean()
+    real_mae = (df["predicted_age"] - df["real_age"]).abs().mean()
+    return appa_mae, real_mae
+
+
+class AppaRealEvaluation(Callback):
+    """Evaluates the model on APPA-REAL every time the checkpoint callback saved a new best model."""
+
+    def __init__(self, checkpoint, img_size, dataset_root, batch_size=128, num_workers=4):
+        super().__init__()
+        self.checkpoint = checkpoint
+        self.img_size = img_size
+        self.dataset_root = dataset_root
+        self.batch_size = batch_size
+        self.num_workers = num_workers
+        self.evaluated_best = None
+
+    def on_epoch_end(self, epoch, logs=None):
+        # must come after the checkpoint callback, whose best value changes when it saves the model
+        if self.checkpoint.best == self.evaluated_best:
+            return
+
+        self.evaluated_best = self.checkpoint.best
+        appa_mae, real_mae = evaluate(get_inference_model(self.model), self.img_size, self.dataset_root,
+                                      self.batch_size, self.num_workers)
+        print("Epoch {}: MAE Apparent: {:.3f}, MAE Real: {:.3f}".format(epoch + 1, appa_mae, real_mae))
+
+        if logs is not None:
+            logs["appa_real_mae_apparent"] = appa_mae
+            logs["appa_real_mae_real"] = real_mae
+
+
 def main():
     args = get_args()
     weight_file = args.weight_file
@@ -38,39 +122,13 @@ def main():
     cfg = OmegaConf.from_dotlist([f"model.model_name={model_name}", f"model.img_size={img_size}"])
     model = get_model(cfg)
     model.load_weights(weight_file)
+    model = get_inference_model(model)
 
     dataset_root = Path(__file__).parent.joinpath("appa-real", "appa-real-release")
-    validation_image_dir = dataset_root.joinpath("valid")
-    gt_valid_path = dataset_root.joinpath("gt_avg_valid.csv")
-    image_paths = list(validation_image_dir.glob("*_face.jpg"))
-    batch_size = 8
-
-    faces = np.empty((batch_size, img_size, img_size, 3))
-    ages = []
-    image_names = []
-
-    for i, image_path in tqdm(enumerate(image_paths)):
-        faces[i % batch_size] = cv2.resize(cv2.imread(str(image_path), 1), (img_size, img_size))
-        image_names.append(image_path.name[:-9])
-
-        if (i + 1) % batch_size == 0 or i == len(image_paths) - 1:
-            results = model.predict(faces)
-            ages_out = np.arange(0, 101).reshape(101, 1)
-            predicted_ages = results[1].dot(ages_out).flatten()
-            ages += list(predicted_ages)
-            # len(ages) can be larger than len(image_names) due to the last batch, but it's ok.
-
-    name2age = {image_names[i]: ages[i] for i in range(len(image_names))}
-    df = pd.read_csv(str(gt_valid_path))
-    appa_abs_error = 0.0
-    real_abs_error = 0.0
-
-    for i, row in df.iterrows():
-        appa_abs_error += abs(name2age[row.file_name] - row.apparent_age_avg)
-        real_abs_error += abs(name2age[row.file_name] - row.real_age)
-
-    print("MAE Apparent: {}".format(appa_abs_error / len(image_names)))
-    print("MAE Real: {}".format(real_abs_error / len(image_names)))
+    appa_mae, real_mae = evaluate(model, img_size, dataset_root, args.batch_size, args.num_workers)
+
+    print("MAE Apparent: {}".format(appa_mae))
+    print("MAE Real: {}".format(real_mae))
 
 
 if __name__ == '__main__':
@@ -0,0 +1,97 @@
+from pathlib import Path
+import cv2
+import numpy as np
+import argparse
+import tensorflow as tf
+from omegaconf import OmegaConf
+from tensorflow.keras.utils import get_file
+from src.factory import get_model, get_inference_model
+
+
+pretrained_model = "https://github.com/yu4u/age-gender-estimation/releases/download/v0.6/EfficientNetB3_224_weights.11-3.44.hdf5"
+modhash = '6d7f7b7ced093a8b3ef6399163da6ece'
+
+
+def get_args():
+    parser = argparse.ArgumentParser(description="This script exports the inference model, which directly outputs "
+                                                 "the gender probability and the expected age, to TensorFlow Lite "
+                                                 "for CPU serving.",
+                                     formatter_class=argparse.ArgumentDefaultsHelpFormatter)
+    parser.add_argument("--weight_file", type=str, default=None,
+                        help="path to weight file (e.g. weights.28-3.73.hdf5)")
+    parser.add_argument("--quantization", type=str, default="float16", choices=["none", "float16", "int8"],
+                        help="post-training quantization; int8 uses dynamic range quantization unless "
+                             "calibration images are given")
+    parser.add_argument("--calibration_dir", type=str, default=None,
+                        help="directory with face images used to calibrate full int8 quantization")
+    parser.add_argument("--calibration_num", type=int, default=100,
+                        help="maximum number of calibration images")
+    parser.add_argument("--top_k", type=int, default=None,
+                        help="if set, the expected age is computed over the k most likely ages only")
+    parser.add_argument("--output", type=str, default=None,
+                        help="output .tflite path; derived from the weight file name if not set")
+    args = parser.parse_args()
+    return args
+
+
+def yield_calibration_data(calibration_dir, img_size, calibration_num):
+    image_paths = sorted(Path(calibration_dir).glob("*.*"))[:calibration_num]
+
+    for image_path in image_paths:
+        img = cv2.imread(str(image_path), 1)
+
+        if img is not None:
+            yield [cv2.resize(img, (img_size, img_size)).astype(np.float32)[np.newaxis]]
+
+
+def get_output_path(weight_file, quantization):
+    # e.g. weights.28-3.73.float16.tflite, or weights.28-3.73.tflite without quantization
+    suffix = ".tflite" if quantization == "none" else f".{quantization}.tflite"
+    return Path(weight_file).with_suffix(suffix)
+
+
+def convert(model, quantization, calibration_data=None):
+    converter = tf.lite.TFLiteConverter.from_keras_model(model)
+
+    if quantization == "float16":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+        converter.target_spec.supported_types = [tf.float16]
+    elif quantization == "int8":
+        converter.optimizations = [tf.lite.Optimize.DEFAULT]
+
+        if calibration_data is not None:
+            converter.representative_dataset = calibration_data
+
+    return converter.convert()
+
+
+def main():
+    args = get_args()
+    weight_file = args.weight_file
+
+    if not weight_file:
+        weight_file = get_file("EfficientNetB3_224_weights.11-3.44.hdf5", pretrained_model, cache_subdir="pretrained_models",
+                               file_hash=modhash, cache_dir=str(Path(__file__).resolve().parent))
+
+    # load model and weights
+    model_name, img_size = Path(weight_file).stem.split("_")[:2]
+    img_size = int(img_size)
+    cfg = OmegaConf.from_dotlist([f"model.model_name={model_name}", f"model.img_size={img_size}"])
+    model = get_model(cfg)
+    model.load_weights(weight_file)
+    model = get_inference_model(model, top_k=args.top_k)
+
+    calibration_data = None
+
+    if args.quantization == "int8" and args.calibration_dir:
+        def calibration_data():
+            return yield_calibration_data(args.calibration_dir, img_size, args.calibration_num)
+
+    tflite_model = convert(model, args.quantization, calibration_data)
+    output_path = Path(args.output) if args.output else get_output_path(weight_file, args.quantization)
+    output_path.write_bytes(tflite_model)
+    print(f"Exported {output_path} ({len(tflite_model) / 2 ** 20:.1f} MiB)")
+
+
+if __name__ == '__main__':
+    main()
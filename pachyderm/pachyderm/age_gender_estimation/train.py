@@ -8,6 +8,7 @@ import tensorflow as tf
 from tensorflow.keras.callbacks import LearningRateScheduler, ModelCheckpoint
 from src.factory import get_model, get_optimizer, get_scheduler
 from src.generator import ImageSequence
+from evaluate_appa_real import AppaRealEvaluation
 
 
 @hydra.main(config_path="src/config.yaml")
@@ -41,14 +42,18 @@ def main(cfg):
     filename = "_".join([cfg.model.model_name,
                          str(cfg.model.img_size),
                          "weights.{epoch:02d}-{val_loss:.2f}.hdf5"])
-    callbacks.extend([
-        LearningRateScheduler(schedule=scheduler),
-        ModelCheckpoint(str(checkpoint_dir) + "/" + filename,
-                        monitor="val_loss",
-                        verbose=1,
-                        save_best_only=True,
-                        mode="auto")
-    ])
+    checkpoint = ModelCheckpoint(str(checkpoint_dir) + "/" + filename,
+                                 monitor="val_loss",
+                                 verbose=1,
+                                 save_best_only=True,
+                                 mode="auto")
+    callbacks.extend([LearningRateScheduler(schedule=scheduler), checkpoint])
+
+    if cfg.train.eval_appa_real:
+        # every saved checkpoint is also evaluated on the APPA-REAL validation set
+        dataset_root = Path(to_absolute_path(__file__)).parent.joinpath("appa-real", "appa-real-release")
+        callbacks.append(AppaRealEvaluation(checkpoint, cfg.model.img_size, dataset_root,
+                                            batch_size=cfg.train.eval_batch_size))
 
     model.fit(train_gen, epochs=cfg.train.epochs, callbacks=callbacks, validation_data=val_gen,
               workers=multiprocessing.cpu_count())
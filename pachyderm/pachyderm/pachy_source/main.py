@@ -18,12 +18,7 @@ from src.factory import get_model, get_optimizer, get_scheduler
 from src.generator import ImageSequence
 from hydra.experimental import compose, initialize
 from omegaconf import OmegaConf
-
-
-# Import all necessary libraries
-import shutil
-import os
-import ubiops
+from publish import publish
 
 
 
@@ -81,13 +76,15 @@ def main(cfg):
     
     model.save("tensorflow_deployment_package/tensorflow_model.h5")
 
+
+def deploy():
     with open('/opt/ubiops/token', 'r') as reader:
         API_TOKEN = reader.read()
     client = ubiops.ApiClient(ubiops.Configuration(api_key={'Authorization': API_TOKEN}, 
                                                host='https://api.ubiops.com/v2.1'))
     api = ubiops.CoreApi(client)
     
-    # Create the deployment
+    # The deployment
     deployment_template = ubiops.DeploymentCreate(
         name=DEPLOYMENT_NAME,
         description='Tensorflow deployment',
@@ -108,12 +105,7 @@ def main(cfg):
         labels={"demo": "tensorflow"}
     )
 
-    api.deployments_create(
-        project_name=PROJECT_NAME,
-        data=deployment_template
-    )
-
-    # Create the version
+    # The version
     version_template = ubiops.DeploymentVersionCreate(
         version=DEPLOYMENT_VERSION,
         language='python3.8',
@@ -123,22 +115,10 @@ def main(cfg):
         maximum_idle_time=1800 # = 30 minutes
     )
 
-    api.deployment_versions_create(
-        project_name=PROJECT_NAME,
-        deployment_name=DEPLOYMENT_NAME,
-        data=version_template
-    )
-
-    # Zip the deployment package
-    shutil.make_archive('tensorflow_deployment_package', 'zip', '.', 'tensorflow_deployment_package')
+    # Create the deployment and version if they don't exist yet, and upload the zipped deployment package
+    # unless an identical package was uploaded before
+    publish(api, PROJECT_NAME, deployment_template, version_template, 'tensorflow_deployment_package')
 
-    # Upload the zipped deployment package
-    file_upload_result =api.revisions_file_upload(
-        project_name=PROJECT_NAME,
-        deployment_name=DEPLOYMENT_NAME,
-        version=DEPLOYMENT_VERSION,
-        file='tensorflow_deployment_package.zip'
-    )
 
 if __name__ == '__main__':
     #with initialize(config_path="age_gender_estimation/src/"):
@@ -146,3 +126,4 @@ if __name__ == '__main__':
         cfg = compose(config_name="config")
         print(OmegaConf.to_yaml(cfg))
     main(cfg)
+    deploy()
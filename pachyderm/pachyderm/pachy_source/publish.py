@@ -0,0 +1,148 @@
+import os
+import shutil
+import hashlib
+import zipfile
+import tempfile
+from pathlib import Path
+import ubiops
+
+
+PACKAGE_HASH_LABEL = 'package_hash'
+# Label values are limited in length, a truncated sha256 is more than enough to detect changes
+PACKAGE_HASH_LENGTH = 32
+CHUNK_SIZE = 1024 * 1024
+
+
+def iter_package_files(package_dir):
+    """
+    Yield all files in the deployment package in a stable order, skipping Python bytecode caches
+    """
+
+    for path in sorted(Path(package_dir).rglob('*')):
+        if path.is_file() and '__pycache__' not in path.parts:
+            yield path
+
+
+def package_hash(package_dir):
+    """
+    Compute a content hash over the relative paths and contents of all files in the deployment package,
+    without building the archive
+    """
+
+    package_dir = Path(package_dir)
+    sha = hashlib.sha256()
+
+    for path in iter_package_files(package_dir):
+        sha.update(path.relative_to(package_dir.parent).as_posix().encode())
+        sha.update(b'\0')
+        sha.update(str(path.stat().st_size).encode())
+        sha.update(b'\0')
+
+        with open(path, 'rb') as f:
+            for chunk in iter(lambda: f.read(CHUNK_SIZE), b''):
+                sha.update(chunk)
+
+    return sha.hexdigest()[:PACKAGE_HASH_LENGTH]
+
+
+def write_package_archive(package_dir, fileobj):
+    """
+    Stream the deployment package into a zip archive file by file, with the package directory as top level
+    folder. Timestamps are fixed, so the same content always results in the same archive.
+    """
+
+    package_dir = Path(package_dir)
+
+    with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+        for path in iter_package_files(package_dir):
+            info = zipfile.ZipInfo(path.relative_to(package_dir.parent).as_posix(), date_time=(1980, 1, 1, 0, 0, 0))
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.external_attr = 0o644 << 16
+
+            with open(path, 'rb') as src, archive.open(info, 'w') as dst:
+                shutil.copyfileobj(src, dst, CHUNK_SIZE)
+
+
+def _get_or_none(get, **kwargs):
+    try:
+        return get(**kwargs)
+    except ubiops.exceptions.ApiException as e:
+        if e.status == 404:
+            return None
+        raise
+
+
+def ensure_deployment(api, project_name, deployment_template):
+    """
+    Create the deployment, or return the existing one if it was created before
+    """
+
+    deployment = _get_or_none(api.deployments_get, project_name=project_name,
+                              deployment_name=deployment_template.name)
+    if deployment is None:
+        deployment = api.deployments_create(project_name=project_name, data=deployment_template)
+    return deployment
+
+
+def ensure_deployment_version(api, project_name, deployment_name, version_template):
+    """
+    Create the deployment version, or return the existing one if it was created before
+    """
+
+    version = _get_or_none(api.deployment_versions_get, project_name=project_name,
+                           deployment_name=deployment_name, version=version_template.version)
+    if version is None:
+        version = api.deployment_versions_create(project_name=project_name, deployment_name=deployment_name,
+                                                 data=version_template)
+    return version
+
+
+def upload_package(api, project_name, deployment_name, version, package_dir):
+    """
+    Upload the deployment package to the version, unless the version already runs a package with the same
+    content hash. Returns the upload result, or None if the upload was skipped.
+    """
+
+    current_version = api.deployment_versions_get(project_name=project_name, deployment_name=deployment_name,
+                                                  version=version)
+    labels = dict(current_version.labels or {})
+    content_hash = package_hash(package_dir)
+
+    if labels.get(PACKAGE_HASH_LABEL) == content_hash:
+        print(f"Deployment package unchanged ({content_hash}), skipping upload")
+        return None
+
+    # The client library uploads from a file path, so the archive is streamed into a temporary file
+    # which is removed directly after the upload
+    fd, archive_path = tempfile.mkstemp(suffix='.zip')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write_package_archive(package_dir, f)
+
+        upload_result = api.revisions_file_upload(
+            project_name=project_name,
+            deployment_name=deployment_name,
+            version=version,
+            file=archive_path
+        )
+    finally:
+        os.remove(archive_path)
+
+    labels[PACKAGE_HASH_LABEL] = content_hash
+    api.deployment_versions_update(
+        project_name=project_name,
+        deployment_name=deployment_name,
+        version=version,
+        data=ubiops.DeploymentVersionUpdate(labels=labels)
+    )
+    return upload_result
+
+
+def publish(api, project_name, deployment_template, version_template, package_dir):
+    """
+    Make sure the deployment and version exist and upload the deployment package if it changed
+    """
+
+    ensure_deployment(api, project_name, deployment_template)
+    ensure_deployment_version(api, project_name, deployment_template.name, version_template)
+    return upload_package(api, project_name, deployment_template.name, version_template.version, package_dir)
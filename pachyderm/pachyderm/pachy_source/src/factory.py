@@ -1,7 +1,8 @@
+import tensorflow as tf
 from tensorflow.keras import applications
 from tensorflow.keras.optimizers import SGD, Adam
 from tensorflow.keras.models import Model
-from tensorflow.keras.layers import Dense
+from tensorflow.keras.layers import Dense, Layer
 
 
 def get_model(cfg):
@@ -17,6 +18,52 @@ def get_model(cfg):
     return model
 
 
+class ExpectedAge(Layer):
+    """Expected age from the age distribution; if top_k is set, only the k most likely ages are used."""
+
+    def __init__(self, top_k=None, **kwargs):
+        super().__init__(**kwargs)
+        self.top_k = top_k
+
+    def call(self, inputs):
+        if self.top_k:
+            probs, indices = tf.math.top_k(inputs, k=self.top_k)
+            ages = tf.cast(indices, inputs.dtype)
+            return tf.reduce_sum(probs * ages, axis=-1) / tf.reduce_sum(probs, axis=-1)
+
+        ages = tf.range(tf.shape(inputs)[-1], dtype=inputs.dtype)
+        return tf.reduce_sum(inputs * ages, axis=-1)
+
+    def get_config(self):
+        config = super().get_config()
+        config.update(top_k=self.top_k)
+        return config
+
+
+class ClassProbability(Layer):
+    """Probability of a single class from a softmax output."""
+
+    def __init__(self, index=0, **kwargs):
+        super().__init__(**kwargs)
+        self.index = index
+
+    def call(self, inputs):
+        return inputs[:, self.index]
+
+    def get_config(self):
+        config = super().get_config()
+        config.update(index=self.index)
+        return config
+
+
+def get_inference_model(model, top_k=None):
+    # wraps a (trained) model from get_model; outputs the probability of gender 0 (female) and the expected age
+    pred_gender, pred_age = model.outputs
+    gender = ClassProbability(index=0, name="gender")(pred_gender)
+    age = ExpectedAge(top_k=top_k, name="age")(pred_age)
+    return Model(inputs=model.inputs, outputs=[gender, age])
+
+
 def get_optimizer(cfg):
     if cfg.train.optimizer_name == "sgd":
         return SGD(lr=cfg.train.lr, momentum=0.9, nesterov=True)
@@ -0,0 +1,111 @@
+import os
+import sys
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+ubiops = pytest.importorskip('ubiops')
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'pachy_source'))
+
+import publish  # noqa: E402
+
+
+class FakeCoreApi:
+    """
+    In-memory stand-in for the deployment endpoints of ubiops.CoreApi used by publish.py
+    """
+
+    def __init__(self):
+        self.deployments = {}
+        # (deployment name, version) -> labels
+        self.versions = {}
+        self.uploads = []
+        self.calls = []
+
+    def deployments_get(self, project_name, deployment_name):
+        if deployment_name not in self.deployments:
+            raise ubiops.exceptions.ApiException(status=404)
+        return self.deployments[deployment_name]
+
+    def deployments_create(self, project_name, data):
+        self.calls.append(('deployments_create', data.name))
+        self.deployments[data.name] = SimpleNamespace(name=data.name)
+        return self.deployments[data.name]
+
+    def deployment_versions_get(self, project_name, deployment_name, version):
+        if (deployment_name, version) not in self.versions:
+            raise ubiops.exceptions.ApiException(status=404)
+        return SimpleNamespace(version=version, labels=dict(self.versions[(deployment_name, version)]))
+
+    def deployment_versions_create(self, project_name, deployment_name, data):
+        self.calls.append(('deployment_versions_create', data.version))
+        self.versions[(deployment_name, data.version)] = {}
+        return SimpleNamespace(version=data.version, labels={})
+
+    def deployment_versions_update(self, project_name, deployment_name, version, data):
+        self.versions[(deployment_name, version)] = dict(data.labels)
+
+    def revisions_file_upload(self, project_name, deployment_name, version, file):
+        with zipfile.ZipFile(file) as archive:
+            self.uploads.append((deployment_name, version, sorted(archive.namelist())))
+        return SimpleNamespace(revision=str(len(self.uploads)))
+
+
+@pytest.fixture
+def package_dir(tmp_path):
+    package = tmp_path / 'deployment_package'
+    package.mkdir()
+    (package / 'deployment.py').write_text('class Deployment:\n    pass\n')
+    (package / 'requirements.txt').write_text('numpy\n')
+    return package
+
+
+def publish_package(api, package_dir):
+    return publish.publish(api, 'project', SimpleNamespace(name='age-estimator'), SimpleNamespace(version='v1'),
+                           package_dir)
+
+
+def test_publish_creates_and_uploads(package_dir):
+    api = FakeCoreApi()
+    assert publish_package(api, package_dir) is not None
+
+    assert api.calls == [('deployments_create', 'age-estimator'), ('deployment_versions_create', 'v1')]
+    assert api.uploads == [('age-estimator', 'v1', ['deployment_package/deployment.py',
+                                                    'deployment_package/requirements.txt'])]
+    assert api.versions[('age-estimator', 'v1')][publish.PACKAGE_HASH_LABEL] == publish.package_hash(package_dir)
+
+
+def test_publish_again_is_idempotent_and_skips_unchanged_upload(package_dir):
+    api = FakeCoreApi()
+    publish_package(api, package_dir)
+    assert publish_package(api, package_dir) is None
+
+    # The deployment and version are not created again, and the unchanged package is not uploaded again
+    assert len(api.calls) == 2
+    assert len(api.uploads) == 1
+
+
+def test_changed_package_is_uploaded(package_dir):
+    api = FakeCoreApi()
+    publish_package(api, package_dir)
+    old_hash = api.versions[('age-estimator', 'v1')][publish.PACKAGE_HASH_LABEL]
+
+    (package_dir / 'deployment.py').write_text('class Deployment:\n    version = 2\n')
+    assert publish_package(api, package_dir) is not None
+
+    assert len(api.uploads) == 2
+    assert len(api.calls) == 2
+    assert api.versions[('age-estimator', 'v1')][publish.PACKAGE_HASH_LABEL] not in (old_hash, None)
+
+
+def test_other_api_errors_are_raised(package_dir):
+    api = FakeCoreApi()
+
+    def forbidden(**kwargs):
+        raise ubiops.exceptions.ApiException(status=403)
+
+    api.deployments_get = forbidden
+    with pytest.raises(ubiops.exceptions.ApiException):
+        publish_package(api, package_dir)
@@ -1,5 +1,8 @@
+import os
 import pandas as pd
 
+from input_cache import InputCache
+
 """
 The file containing the deployment code is required to be called 'deployment.py' and should contain the 'Deployment'
 class and 'request' method.
@@ -27,6 +30,9 @@ class Deployment:
 
         print("Initialising My Deployment")
 
+        # Input files are cached in memory by content, so the same input isn't read and parsed again
+        self.inputs = InputCache(max_bytes=int(os.environ.get('INPUT_CACHE_MAX_BYTES', 256 * 2 ** 20)))
+
     def request(self, data):
         """
         Method for deployment requests, called separately for each individual request.
@@ -39,7 +45,7 @@ class Deployment:
             with plain output, it is a string. In this example, a dictionary with the key: output.
         """
 
-        pokemon_stats = pd.read_csv(data.get('input_pokemon'))
+        pokemon_stats = self.inputs.read_csv(data.get('input_pokemon'), copy=False)
 
         sorted_pokemon_stats = pokemon_stats.sort_values(["HP", "Attack", "Defense", "Sp. Atk", "Sp. Def", "Speed"])
 
@@ -1,7 +1,10 @@
+import os
 import pandas as pd
 import numpy as np
 import matplotlib.pyplot as plt
 
+from input_cache import InputCache
+
 """
 The file containing the deployment code is required to be called 'deployment.py' and should contain the 'Deployment'
 class and 'request' method.
@@ -29,6 +32,9 @@ class Deployment:
 
         print("Initialising My Deployment")
 
+        # Input files are cached in memory by content, so the same input isn't read and parsed again
+        self.inputs = InputCache(max_bytes=int(os.environ.get('INPUT_CACHE_MAX_BYTES', 256 * 2 ** 20)))
+
     def request(self, data):
         """
         Method for deployment requests, called separately for each individual request.
@@ -48,7 +54,7 @@ class Deployment:
         # Attack and Defense, Sp. Atk and Sp. Def will show on opposite positions
         use_attributes = ['Speed', 'Sp. Atk', 'Defense', 'HP', 'Sp. Def', 'Attack']
 
-        pokemon = pd.read_csv(data.get("input_pokemon"))
+        pokemon = self.inputs.read_csv(data.get("input_pokemon"), copy=False)
         df_plot = pokemon
 
         datas = df_plot[use_attributes].values
@@ -8,6 +8,9 @@ import numpy as np
 import os
 from joblib import load
 
+from input_cache import InputCache
+from instrumentation import stage
+
 class Deployment:
 
     def __init__(self, base_directory, context):
@@ -32,6 +35,10 @@ class Deployment:
         KNN_MODEL = os.path.join(base_directory, "knn.joblib")
         self.model = load(KNN_MODEL)
 
+        # Input files are cached in memory by content, so the same input isn't read and parsed again
+        self.inputs = InputCache(max_bytes=int(os.environ.get('INPUT_CACHE_MAX_BYTES', 256 * 2 ** 20)))
+
+    @stage('request')
     def request(self, data):
         """
         Method for deployment requests, called separately for each individual request.
@@ -44,15 +51,18 @@ class Deployment:
             with plain output, it is a string. In this example, a dictionary with the key: output.
         """
         print('Loading data')
-        input_data = pd.read_csv(data['data'])
+        with stage('load'):
+            input_data = self.inputs.read_csv(data['data'], copy=False)
         
         print("Prediction being made")
-        prediction = self.model.predict(input_data)
-        diabetes_instances = sum(prediction)
+        with stage('predict'):
+            prediction = self.model.predict(input_data)
+            diabetes_instances = sum(prediction)
         
         # Writing the prediction to a csv for further use
         print('Writing prediction to csv')
-        pd.DataFrame(prediction).to_csv('prediction.csv', header = ['diabetes_prediction'], index_label= 'index')
+        with stage('write'):
+            pd.DataFrame(prediction).to_csv('prediction.csv', header = ['diabetes_prediction'], index_label= 'index')
         
         return {
             "prediction": 'prediction.csv', "predicted_diabetes_instances": diabetes_instances
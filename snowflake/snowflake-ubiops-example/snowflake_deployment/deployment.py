@@ -5,6 +5,8 @@ class and 'request' method.
 import snowflake.connector as sf
 import os
 
+from query import ConnectionPool, ProductQueries, PriceIndex
+
 
 class Deployment:
 
@@ -33,19 +35,46 @@ class Deployment:
         SNOWFLAKE_PASSWORD = os.environ.get('SNOWFLAKE_PASSWORD')
         SNOWFLAKE_DATABASE = os.environ.get('SNOWFLAKE_DATABASE')
 
-        try:        
-            con = sf.connect(
+        # Connections are opened when needed, health-checked when they were idle for a while and replaced when they
+        # fail, so a failing database doesn't leave the deployment without a connection
+        self.pool = ConnectionPool(
+            connect=lambda: sf.connect(
                 user=SNOWFLAKE_USERNAME,
                 password=SNOWFLAKE_PASSWORD,
                 account=SNOWFLAKE_ACCOUNT,
                 database=SNOWFLAKE_DATABASE
-            )
-            self.cur = con.cursor()
+            ),
+            size=int(os.environ.get('POOL_SIZE', 2))
+        )
+        # Results are cached per price bucket (PRICE_BUCKET_SIZE) for CACHE_TTL seconds
+        self.queries = ProductQueries(
+            pool=self.pool,
+            paramstyle=sf.paramstyle,
+            retry_on=(sf.OperationalError, sf.InterfaceError),
+            bucket_size=float(os.environ.get('PRICE_BUCKET_SIZE', 1.0)),
+            ttl=float(os.environ.get('CACHE_TTL', 60))
+        )
 
+        try:
+            # Open the first connection directly, so connection problems show up in the logs at start-up
+            with self.pool.connection():
+                pass
         except Exception as e:
             print('There was a problem connecting to the database!')
             print(e)
 
+        # With PRICE_INDEX_REFRESH_INTERVAL set, requests are answered from a sorted in-memory snapshot of all
+        # prices, which is refreshed in the background every this number of seconds. If the first snapshot fails, it
+        # is retried every PRICE_INDEX_RETRY_INTERVAL seconds and requests are answered with queries until it succeeds.
+        refresh_interval = float(os.environ.get('PRICE_INDEX_REFRESH_INTERVAL', 0))
+        if refresh_interval > 0:
+            self.products = PriceIndex(
+                self.queries,
+                refresh_interval=refresh_interval,
+                retry_interval=float(os.environ.get('PRICE_INDEX_RETRY_INTERVAL', 10))
+            )
+        else:
+            self.products = self.queries
 
     def request(self, data):
         """
@@ -60,9 +89,8 @@ class Deployment:
         """
 
         # Price limit
-        max_price = data['max_price']
-        self.cur.execute(f'SELECT * from product where price < {max_price};')
-        items = self.cur.fetchall()
+        max_price = float(data['max_price'])
+        items = self.products.affordable_products(max_price)
 
         # No affordable items
         if len(items) == 0:
@@ -71,7 +99,7 @@ class Deployment:
             }
 
         # Format items that the user can purchase
-        affordable_items = ', '.join(list(map(lambda x: x[0], items)))
+        affordable_items = ', '.join(items)
         return {
             "output": f"You can afford to buy the following ({affordable_items})"
         }
@@ -0,0 +1,262 @@
+"""
+Query layer for the product table: a pool of health-checked connections, parameterized queries and a result cache.
+It only relies on the Python DB-API, so a local SQLite database can stand in for Snowflake.
+
+For read-heavy traffic, PriceIndex keeps a sorted snapshot of all product prices in memory instead, which is refreshed
+in the background and answers requests with a binary search.
+"""
+
+import math
+import bisect
+import time
+import queue
+import threading
+from contextlib import contextmanager
+
+
+PLACEHOLDERS = {
+    'qmark': '?',
+    'numeric': ':1',
+    'format': '%s',
+    'pyformat': '%s',
+}
+
+
+class ConnectionPool:
+
+    def __init__(self, connect, size=2, health_check_interval=300, health_check_query='SELECT 1',
+                 clock=time.monotonic):
+        """
+        :param callable connect: function that opens a new connection
+        :param int size: maximum number of open connections
+        :param float health_check_interval: connections that were idle for longer than this number of seconds are
+            checked before they are handed out, and replaced if the check fails
+        :param str health_check_query: query used to check a connection
+        :param callable clock: function returning the current time in seconds
+        """
+
+        self.connect = connect
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self.health_check_query = health_check_query
+        self.clock = clock
+        # Idle connections with the time they were last used, the most recently used connection is handed out first
+        self._idle = queue.LifoQueue()
+        self._slots = threading.BoundedSemaphore(size)
+
+    @contextmanager
+    def connection(self):
+        """
+        Hand out a connection. If the block raises an error, the connection is closed instead of returned to the pool.
+        """
+
+        self._slots.acquire()
+        try:
+            conn = self._acquire()
+        except Exception:
+            self._slots.release()
+            raise
+
+        try:
+            yield conn
+        except Exception:
+            self._close(conn)
+            self._slots.release()
+            raise
+
+        self._idle.put((conn, self.clock()))
+        self._slots.release()
+
+    def close(self):
+        while True:
+            try:
+                conn, _ = self._idle.get_nowait()
+            except queue.Empty:
+                return
+            self._close(conn)
+
+    def _acquire(self):
+        while True:
+            try:
+                conn, last_used = self._idle.get_nowait()
+            except queue.Empty:
+                return self.connect()
+
+            if self.clock() - last_used < self.health_check_interval or self._is_healthy(conn):
+                return conn
+            self._close(conn)
+
+    def _is_healthy(self, conn):
+        try:
+            cur = conn.cursor()
+            try:
+                cur.execute(self.health_check_query)
+                cur.fetchall()
+            finally:
+                cur.close()
+            return True
+        except Exception:
+            return False
+
+    @staticmethod
+    def _close(conn):
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+
+class ProductQueries:
+
+    def __init__(self, pool, paramstyle='pyformat', retry_on=(Exception,), retries=1, bucket_size=1.0, ttl=60,
+                 max_entries=1024, clock=time.monotonic):
+        """
+        :param ConnectionPool pool: pool to get connections from
+        :param str paramstyle: DB-API paramstyle of the connector, e.g. `snowflake.connector.paramstyle`
+        :param tuple retry_on: errors after which a query is retried on a new connection
+        :param int retries: maximum number of retries of a query
+        :param float bucket_size: prices are rounded up to a multiple of the bucket size for caching, so requests with
+            nearby prices share a single query. Set to 0 to disable the cache.
+        :param float ttl: number of seconds a cached result is used
+        :param int max_entries: maximum number of cached results
+        :param callable clock: function returning the current time in seconds
+        """
+
+        self.pool = pool
+        self.placeholder = PLACEHOLDERS[paramstyle]
+        self.retry_on = retry_on
+        self.retries = retries
+        self.bucket_size = bucket_size
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.clock = clock
+        # price bucket -> (rows, expiry time)
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def fetch(self, query, params=()):
+        """
+        Execute a parameterized query and return all rows, retrying on a new connection if the connection failed
+        """
+
+        for attempt in range(self.retries + 1):
+            try:
+                with self.pool.connection() as conn:
+                    cur = conn.cursor()
+                    try:
+                        cur.execute(query, params)
+                        return cur.fetchall()
+                    finally:
+                        cur.close()
+            except self.retry_on:
+                if attempt == self.retries:
+                    raise
+
+    def products_below(self, max_price):
+        """
+        Return the (name, price) of all products with a price lower than max_price, ordered by price
+        """
+
+        return self.fetch(
+            f'SELECT name, price FROM product WHERE price < {self.placeholder} ORDER BY price', (max_price,)
+        )
+
+    def affordable_products(self, max_price):
+        """
+        Return the names of all products with a price lower than max_price, ordered by price
+        """
+
+        if not self.bucket_size:
+            return [name for name, _ in self.products_below(max_price)]
+
+        # Query and cache all products below the upper bound of the bucket, and filter on the exact price afterwards
+        bucket = math.floor(max_price / self.bucket_size) + 1
+        now = self.clock()
+
+        with self._lock:
+            cached = self._cache.get(bucket)
+
+        if cached is not None and cached[1] > now:
+            rows = cached[0]
+        else:
+            rows = self.products_below(bucket * self.bucket_size)
+            with self._lock:
+                self._cache[bucket] = (rows, now + self.ttl)
+                if len(self._cache) > self.max_entries:
+                    del self._cache[min(self._cache, key=lambda key: self._cache[key][1])]
+
+        return [name for name, price in rows if price < max_price]
+
+    def clear_cache(self):
+        with self._lock:
+            self._cache.clear()
+
+
+class PriceIndex:
+
+    def __init__(self, queries, refresh_interval=300, retry_interval=10):
+        """
+        :param ProductQueries queries: queries used to take the snapshots, and to answer requests until the first
+            snapshot is taken
+        :param float refresh_interval: number of seconds between snapshots, taken in a background thread
+        :param float retry_interval: number of seconds between attempts to take the first snapshot, if it failed
+        """
+
+        self.queries = queries
+        self.refresh_interval = refresh_interval
+        self.retry_interval = retry_interval
+        # (sorted prices, names in the same order), replaced as a whole so readers never see a partial snapshot. None
+        # until the first snapshot is taken.
+        self._snapshot = None
+        try:
+            self.refresh()
+        except Exception as e:
+            # The background thread keeps trying, requests are answered with queries in the meantime
+            print(f'There was a problem building the price index, retrying every {retry_interval} seconds!')
+            print(e)
+
+        self._stop = threading.Event()
+        self._refresher = threading.Thread(target=self._refresh_periodically, daemon=True)
+        self._refresher.start()
+
+    @property
+    def ready(self):
+        return self._snapshot is not None
+
+    def refresh(self):
+        """
+        Take a new snapshot of the names and prices of all products
+        """
+
+        rows = self.queries.fetch('SELECT name, price FROM product WHERE price IS NOT NULL')
+        rows = sorted(rows, key=lambda row: row[1])
+        self._snapshot = ([price for _, price in rows], [name for name, _ in rows])
+
+    def affordable_products(self, max_price):
+        """
+        Return the names of all products with a price lower than max_price, ordered by price
+        """
+
+        snapshot = self._snapshot
+        if snapshot is None:
+            return self.queries.affordable_products(max_price)
+
+        prices, names = snapshot
+        return names[:bisect.bisect_left(prices, max_price)]
+
+    def close(self):
+        self._stop.set()
+        self._refresher.join()
+
+    def _refresh_periodically(self):
+        while not self._stop.wait(self.refresh_interval if self.ready else self.retry_interval):
+            had_snapshot = self.ready
+            try:
+                self.refresh()
+            except Exception as e:
+                # Keep answering from the previous snapshot, or with queries if there is none yet
+                print('There was a problem refreshing the price index!')
+                print(e)
+            else:
+                if not had_snapshot:
+                    print('The price index is built, requests are answered from the index')
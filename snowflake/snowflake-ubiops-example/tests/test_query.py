@@ -0,0 +1,118 @@
+import os
+import sys
+import time
+import sqlite3
+
+import pytest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..', 'snowflake_deployment'))
+
+from query import ConnectionPool, ProductQueries, PriceIndex  # noqa: E402
+
+
+PRODUCTS = [('pen', 1.5), ('book', 12.0), ('lamp', 30.0), ('chair', 80.0), ('unpriced', None)]
+
+
+class Database:
+    """
+    A shared SQLite database with the product table, that can be taken down to simulate connection failures
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.up = True
+        self.connections = 0
+        conn = sqlite3.connect(path)
+        conn.execute('CREATE TABLE product (name TEXT, price REAL)')
+        conn.executemany('INSERT INTO product VALUES (?, ?)', PRODUCTS)
+        conn.commit()
+        conn.close()
+
+    def connect(self):
+        if not self.up:
+            raise sqlite3.OperationalError('database is down')
+        self.connections += 1
+        return sqlite3.connect(self.path, check_same_thread=False)
+
+
+@pytest.fixture
+def database(tmp_path):
+    return Database(str(tmp_path / 'shop.db'))
+
+
+def make_queries(database, **kwargs):
+    pool = ConnectionPool(database.connect, size=2)
+    return ProductQueries(pool, paramstyle='qmark', retry_on=(sqlite3.Error,), **kwargs)
+
+
+def test_products_below_is_parameterized_and_ordered(database):
+    queries = make_queries(database, bucket_size=0)
+
+    assert queries.affordable_products(31) == ['pen', 'book', 'lamp']
+    assert queries.affordable_products(0) == []
+    # The price is passed as a parameter, not formatted into the query
+    queries.products_below("1; DROP TABLE product")
+    assert queries.affordable_products(100) == ['pen', 'book', 'lamp', 'chair']
+
+
+def test_pool_reuses_connections(database):
+    queries = make_queries(database, bucket_size=0)
+    for _ in range(10):
+        queries.affordable_products(50)
+    assert database.connections == 1
+
+
+def test_cached_bucket_filters_on_the_exact_price(database):
+    queries = make_queries(database, bucket_size=10, ttl=60)
+
+    assert queries.affordable_products(12.0) == ['pen']
+    assert queries.affordable_products(15.0) == ['pen', 'book']
+    # Both prices fall in the same bucket, so the second request was answered from the cache
+    assert len(queries._cache) == 1
+
+
+def test_broken_connection_is_replaced(database):
+    queries = make_queries(database, bucket_size=0)
+    queries.affordable_products(50)
+
+    # Close the idle connection behind the pool's back, the query is retried on a new connection
+    conn, _ = queries.pool._idle.get_nowait()
+    conn.close()
+    queries.pool._idle.put((conn, time.monotonic()))
+
+    assert queries.affordable_products(50) == ['pen', 'book', 'lamp']
+    assert database.connections == 2
+
+
+def test_price_index_answers_from_the_snapshot(database):
+    queries = make_queries(database, bucket_size=0)
+    index = PriceIndex(queries, refresh_interval=60)
+    try:
+        database.up = False
+        assert index.ready
+        assert index.affordable_products(31) == ['pen', 'book', 'lamp']
+        assert index.affordable_products(1.5) == []
+    finally:
+        index.close()
+
+
+def test_price_index_falls_back_to_queries_until_the_database_is_up(database):
+    database.up = False
+    queries = make_queries(database, bucket_size=0)
+    index = PriceIndex(queries, refresh_interval=60, retry_interval=0.05)
+    try:
+        assert not index.ready
+        # Requests are answered with queries, which fail while the database is down
+        with pytest.raises(sqlite3.OperationalError):
+            index.affordable_products(31)
+
+        database.up = True
+        assert index.affordable_products(31) == ['pen', 'book', 'lamp']
+
+        deadline = time.monotonic() + 5
+        while not index.ready and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert index.ready
+        assert index.affordable_products(100) == ['pen', 'book', 'lamp', 'chair']
+    finally:
+        index.close()
@@ -8,6 +8,9 @@ import numpy as np
 import os
 from joblib import load
 
+from input_cache import InputCache
+from instrumentation import stage
+
 class Deployment:
 
     def __init__(self, base_directory, context):
@@ -16,16 +19,23 @@ class Deployment:
         XGBOOST_MODEL = os.path.join(base_directory, "fraud_model.joblib")
         self.model = load(XGBOOST_MODEL)
 
+        # Input files are cached in memory by content, so the same input isn't read and parsed again
+        self.inputs = InputCache(max_bytes=int(os.environ.get('INPUT_CACHE_MAX_BYTES', 256 * 2 ** 20)))
+
+    @stage('request')
     def request(self, data):
         print('Loading data')
-        input_data = pd.read_csv(data['input'])
+        with stage('load'):
+            input_data = self.inputs.read_csv(data['input'], copy=False)
         
         print("Prediction being made")
-        prediction = self.model.predict(input_data)
+        with stage('predict'):
+            prediction = self.model.predict(input_data)
         
         # Writing the prediction to a csv for further use
         print('Writing prediction to csv')
-        pd.DataFrame(prediction).to_csv('prediction.csv', header = ['Class prediction'], index_label= 'index')
+        with stage('write'):
+            pd.DataFrame(prediction).to_csv('prediction.csv', header = ['Class prediction'], index_label= 'index')
         
         return {
             "output": 'prediction.csv'
@@ -0,0 +1,124 @@
+"""
+Content-addressed cache for the input files of requests, such as the blobs UbiOps downloads for every request.
+
+Files are identified by a hash of their content, so the same blob is recognised even when it is stored at a new path for
+every request, version or pipeline branch. A path is not read again as long as its size and modification time don't
+change. Both the raw bytes and the parsed DataFrames are kept in memory, and the least recently used entries are evicted
+once the cache grows beyond its size limit.
+"""
+
+import io
+import os
+import hashlib
+import threading
+from collections import OrderedDict
+
+import pandas as pd
+
+
+class InputCache:
+
+    def __init__(self, max_bytes=256 * 2 ** 20, max_paths=1024):
+        """
+        :param int max_bytes: maximum total size of the cached bytes and DataFrames
+        :param int max_paths: maximum number of paths of which the content hash is remembered
+        """
+
+        self.max_bytes = max_bytes
+        self.max_paths = max_paths
+        self.hits = 0
+        self.misses = 0
+
+        # (kind, content hash, ...) -> (value, size in bytes), from least to most recently used
+        self._entries = OrderedDict()
+        self._size = 0
+        # path -> ((size, modification time, inode), content hash)
+        self._digests = OrderedDict()
+        self._lock = threading.RLock()
+
+    def read_bytes(self, path):
+        """
+        Return the content of a file
+        """
+
+        with self._lock:
+            digest, data = self._digest(path)
+            if data is None:
+                data = self._get(('bytes', digest))
+            if data is None:
+                with open(path, 'rb') as f:
+                    data = f.read()
+                self._put(('bytes', digest), data, len(data))
+            return data
+
+    def read_csv(self, path, copy=True, **kwargs):
+        """
+        Return the DataFrame of a CSV file, parsed with `pandas.read_csv`
+
+        :param str path: path to the CSV file
+        :param bool copy: return a copy of the cached DataFrame. Only disable this when the DataFrame isn't modified,
+            otherwise the changes end up in the cache.
+        :param kwargs: keyword arguments of `pandas.read_csv`, files parsed with other arguments are cached separately
+        """
+
+        with self._lock:
+            digest, _ = self._digest(path)
+            key = ('csv', digest, repr(sorted(kwargs.items())))
+            df = self._get(key)
+            if df is None:
+                self.misses += 1
+                df = pd.read_csv(io.BytesIO(self.read_bytes(path)), **kwargs)
+                self._put(key, df, int(df.memory_usage(deep=True).sum()))
+            else:
+                self.hits += 1
+
+        return df.copy() if copy else df
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._digests.clear()
+            self._size = 0
+
+    def _digest(self, path):
+        """
+        Return the content hash of a file, and its content if the file had to be read to compute the hash
+        """
+
+        stat = os.stat(path)
+        signature = (stat.st_size, stat.st_mtime_ns, stat.st_ino)
+        cached = self._digests.get(path)
+        if cached is not None and cached[0] == signature:
+            self._digests.move_to_end(path)
+            return cached[1], None
+
+        with open(path, 'rb') as f:
+            data = f.read()
+        digest = hashlib.blake2b(data, digest_size=16).hexdigest()
+
+        self._digests[path] = (signature, digest)
+        if len(self._digests) > self.max_paths:
+            self._digests.popitem(last=False)
+        self._put(('bytes', digest), data, len(data))
+        return digest, data
+
+    def _get(self, key):
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        self._entries.move_to_end(key)
+        return entry[0]
+
+    def _put(self, key, value, size):
+        if size > self.max_bytes:
+            return
+
+        old = self._entries.pop(key, None)
+        if old is not None:
+            self._size -= old[1]
+        self._entries[key] = (value, size)
+        self._size += size
+
+        while self._size > self.max_bytes:
+            _, (_, evicted_size) = self._entries.popitem(last=False)
+            self._size -= evicted_size